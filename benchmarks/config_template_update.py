@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Count the update_config_template requests and bytes sent by foreman_config_template
+# when updating locked and unlocked templates, before and after sending the body only once.
+#
+# The module and its utils need python-foreman and Ansible, so the pure functions used by the
+# update path are loaded from their source instead of importing the module.
+#
+# Usage: python benchmarks/config_template_update.py
+
+import ast
+import json
+import os
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+BODY = '<%#\nkind: provision\nname: Kickstart\n%>\n' + 'echo "provisioning step"\n' * 4000
+
+
+def load_functions(path, names, namespace):
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read(), path)
+    tree.body = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names]
+    exec(compile(tree, path, 'exec'), namespace)
+    return namespace
+
+
+class FakeForeman(object):
+    """Fake client which applies and records every update of a config template."""
+
+    def __init__(self, config_template):
+        self.config_template = dict(config_template)
+        self.requests = 0
+        self.bytes = 0
+
+    def update_config_template(self, id, data):
+        if self.config_template['locked'] and data.get('locked', True):
+            raise AssertionError('Foreman rejects changes to a locked template')
+        self.requests += 1
+        self.bytes += len(json.dumps(data))
+        self.config_template.update((key, value) for key, value in data.items() if key != 'id')
+        return dict(self.config_template)
+
+
+def update_template_before(theforeman, config_template, data):
+    # The update path of foreman_config_template.ensure() before the change
+    data = dict(data)
+    if config_template['locked']:
+        unlock = {'id': config_template.get('id'), 'locked': False}
+        theforeman.update_config_template(id=config_template.get('id'), data=unlock)
+    if data.get('locked', config_template['locked']):
+        data['locked'] = False
+        theforeman.update_config_template(id=config_template.get('id'), data=data)
+        data['locked'] = True
+    return theforeman.update_config_template(id=config_template.get('id'), data=data)
+
+
+SCENARIOS = [
+    ('locked, body changed', dict(locked=True, template=BODY), dict(locked=True, template=BODY + 'reboot\n')),
+    ('locked, lock removed', dict(locked=True, template=BODY), dict(locked=False, template=BODY)),
+    ('unlocked, lock added', dict(locked=False, template=BODY), dict(locked=True, template=BODY)),
+    ('unlocked, body changed', dict(locked=False, template=BODY), dict(locked=False, template=BODY + 'reboot\n')),
+]
+
+
+def main():
+    namespace = load_functions('module_utils/foreman_utils.py',
+                               ['dict_list_to_list', 'operatingsystems_equal', 'organizations_equal',
+                                'locations_equal'], dict())
+    load_functions('foreman_config_template.py', ['templates_equal', 'update_template'], namespace)
+
+    print('{0:<24} {1:>15} {2:>15} {3:>15} {4:>15}'.format('scenario', 'requests before', 'bytes before',
+                                                            'requests after', 'bytes after'))
+    for name, current, defined in SCENARIOS:
+        config_template = dict(current, id=1, name='Kickstart')
+        data = dict(defined, name='Kickstart')
+        row = [name]
+        for update in [update_template_before, namespace['update_template']]:
+            theforeman = FakeForeman(config_template)
+            result = update(theforeman, dict(config_template), dict(data))
+            assert result['locked'] == defined['locked'] and result['template'] == defined['template']
+            row.extend([theforeman.requests, theforeman.bytes])
+        print('{0:<24} {1:>15} {2:>15} {3:>15} {4:>15}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
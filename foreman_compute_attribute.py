@@ -25,13 +25,42 @@ description:
 options:
   compute_resource:
     description: Name of compute resource
-    required: true
+    required: false
   compute_profile:
     description: Name of compute profile
-    required: true
+    required: false
   vm_attributes:
-    description: Hash containing the data of vm_attrs
-    required: true
+    description:
+    - Hash containing the data of vm_attrs
+    - Only defined keys are compared, nested hashes recursively. Values are compared as strings and lists are
+      compared like hashes keyed by index, as Foreman stores them. Changed keys are returned as changed_paths.
+    required: false
+  compute_attributes:
+    description:
+    - List of compute attributes, each defined by compute_profile, compute_resource and vm_attributes.
+      Mutually exclusive with compute_profile and compute_resource.
+    - Compute profiles and resources are resolved once and the existing attributes are fetched once per compute
+      profile, only changed attributes are written in parallel.
+    required: false
+  workers:
+    description: Number of parallel requests used by compute_attributes
+    required: false
+    default: 4
+  resolve_names:
+    description:
+    - Resolve names of clusters, networks, datastores, storage domains and storage pods used in vm_attributes to
+      their ids using the available_* catalogs of the compute resource. Values which are no known name are kept.
+    - Resource pools are not resolved, as Foreman lists them per cluster only. Use their ids.
+    required: false
+    default: false
+  catalog_cache_ttl:
+    description: Seconds the available_* catalogs of a compute resource are cached in cache_dir
+    required: false
+    default: 3600
+  cache_dir:
+    description: Directory to cache the available_* catalogs of compute resources in
+    required: false
+    default: None
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -56,6 +85,8 @@ version_added: "2.0"
 author: "Thomas Krahn (@nosmoht)"
 '''
 
+import re
+
 try:
     from foreman.foreman import *
 
@@ -63,6 +94,163 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+# Keys only used by the Foreman web form which are not stored in vm_attrs
+FORM_ONLY_KEY_RE = re.compile(r'^(_delete|new_\w+)$')
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def normalize_vm_attrs(value):
+    # Foreman stores nested lists as hashes keyed by index and all values as strings
+    if isinstance(value, list):
+        value = dict((str(index), item) for index, item in enumerate(value))
+    if isinstance(value, dict):
+        return dict((str(key), normalize_vm_attrs(item)) for key, item in value.items())
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return ''
+    if isinstance(value, string_types):
+        return value
+    return str(value)
+
+
+def vm_attrs_diff(vm_attributes, vm_attrs, path=()):
+    """Return the key paths of all normalized vm_attributes which differ from the normalized vm_attrs."""
+    result = []
+    for key, value in vm_attributes.items():
+        key_path = path + (key,)
+        if key not in vm_attrs:
+            if not FORM_ONLY_KEY_RE.match(key):
+                result.append(key_path)
+        elif isinstance(value, dict) and isinstance(vm_attrs[key], dict):
+            result.extend(vm_attrs_diff(value, vm_attrs[key], key_path))
+        elif value != vm_attrs[key]:
+            result.append(key_path)
+    return sorted(result)
+
+
+def get_vm_attrs_value(vm_attributes, key_path):
+    # Keys of a path are the normalized ones, so list items are keyed by their index as string
+    value = vm_attributes
+    for key in key_path:
+        if isinstance(value, list):
+            value = value[int(key)]
+        else:
+            value = next(item for item_key, item in value.items() if str(item_key) == key)
+    return value
+
+
+def set_vm_attrs_value(vm_attrs, key_path, value):
+    """Return a copy of vm_attrs with value set at key_path, all other values are kept as they are."""
+    result = dict(vm_attrs) if isinstance(vm_attrs, dict) else dict()
+    key = key_path[0]
+    if len(key_path) > 1:
+        value = set_vm_attrs_value(result.get(key), key_path[1:], value)
+    result[key] = value
+    return result
+
+
+def get_vm_attrs_update(vm_attributes, compute_attribute):
+    """Return the changed paths and the vm_attrs to update compute_attribute with.
+
+    Foreman replaces vm_attrs as a whole, so the defined values of the changed paths are set in the
+    current vm_attrs. Normalized copies are used for the comparison only.
+    """
+    vm_attributes = vm_attributes or dict()
+    vm_attrs = compute_attribute.get('vm_attrs') or dict()
+    changed_paths = vm_attrs_diff(normalize_vm_attrs(vm_attributes), normalize_vm_attrs(vm_attrs))
+    if not changed_paths:
+        return [], None
+    for key_path in changed_paths:
+        vm_attrs = set_vm_attrs_value(vm_attrs, key_path, get_vm_attrs_value(vm_attributes, key_path))
+    return ['.'.join(key_path) for key_path in changed_paths], vm_attrs
+
+
+def sync_compute_attributes(module):
+    workers = module.params['workers']
+
+    theforeman = init_foreman_client(module)
+    indexes = dict()
+    catalogs = dict()
+
+    compute_profiles = get_resource_index(module, theforeman, indexes, 'compute_profiles', keys=('name',))
+    compute_resources = get_resource_index(module, theforeman, indexes, 'compute_resources', keys=('name',))
+
+    cells = []
+    for item in module.params['compute_attributes']:
+        compute_profile = compute_profiles.get(item.get('compute_profile'))
+        if not compute_profile:
+            module.fail_json(msg='Compute profile not found: {0}'.format(item.get('compute_profile')))
+        compute_resource = compute_resources.get(item.get('compute_resource'))
+        if not compute_resource:
+            module.fail_json(msg='Compute resource not found: {0}'.format(item.get('compute_resource')))
+        vm_attributes = item.get('vm_attributes') or dict()
+        if module.params['resolve_names']:
+            vm_attributes = resolve_compute_resource_names(module, theforeman, compute_resource.get('id'),
+                                                           vm_attributes, catalogs, workers)
+        cells.append(dict(compute_profile=compute_profile, compute_resource=compute_resource,
+                          vm_attributes=vm_attributes))
+
+    # The compute attributes of all compute resources are part of the compute profile
+    compute_attributes = dict()
+    profile_ids = list(set(cell['compute_profile'].get('id') for cell in cells))
+    for profile_id, compute_profile, error in run_parallel(lambda item: theforeman.get_compute_profile(id=item),
+                                                           profile_ids, workers):
+        if error:
+            module.fail_json(msg='Could not get compute profile {0}: {1}'.format(profile_id, error))
+        for compute_attribute in compute_profile.get('compute_attributes') or []:
+            compute_attributes[(profile_id, compute_attribute.get('compute_resource_id'))] = compute_attribute
+
+    for cell in cells:
+        cell['compute_attribute'] = compute_attributes.get((cell['compute_profile'].get('id'),
+                                                            cell['compute_resource'].get('id')))
+        cell['changed_paths'] = []
+        if not cell['compute_attribute']:
+            cell['action'] = 'created'
+            continue
+        cell['changed_paths'], cell['vm_attrs'] = get_vm_attrs_update(cell['vm_attributes'],
+                                                                      cell['compute_attribute'])
+        cell['action'] = 'updated' if cell['changed_paths'] else 'unchanged'
+
+    def apply(cell):
+        if cell['compute_attribute']:
+            return theforeman.update_compute_attribute(id=cell['compute_attribute'].get('id'),
+                                                       data={'vm_attrs': cell['vm_attrs']})
+        return theforeman.create_compute_attribute(compute_resource_id=cell['compute_resource'].get('id'),
+                                                   compute_profile_id=cell['compute_profile'].get('id'),
+                                                   data={'vm_attrs': cell['vm_attributes']})
+
+    errors = []
+    for cell, compute_attribute, error in run_parallel(apply, [cell for cell in cells
+                                                               if cell['action'] != 'unchanged'], workers):
+        if error:
+            cell['action'] = 'failed'
+            errors.append('{0} on {1}: {2}'.format(cell['compute_profile'].get('name'),
+                                                   cell['compute_resource'].get('name'), error))
+
+    results = [dict(compute_profile=cell['compute_profile'].get('name'),
+                    compute_resource=cell['compute_resource'].get('name'),
+                    action=cell['action'],
+                    changed_paths=cell['changed_paths']) for cell in cells]
+    changed = any(cell['action'] in ['created', 'updated'] for cell in cells)
+    if errors:
+        module.fail_json(msg='Could not sync compute attributes: {0}'.format('; '.join(errors)),
+                         changed=changed, compute_attributes=results)
+    return changed, results
+
 
 def ensure(module):
     compute_profile_name = module.params['compute_profile']
@@ -97,6 +285,10 @@ def ensure(module):
         module.fail_json(msg='Could not get compute profile {0} on {1}'.format(compute_profile_name,
                                                                                compute_resource_name))
 
+    if module.params['resolve_names']:
+        vm_attributes = resolve_compute_resource_names(module, theforeman, compute_resource.get('id'),
+                                                       vm_attributes, dict())
+
     compute_attributes = theforeman.get_compute_attribute(compute_resource_id=compute_resource.get('id'),
                                                           compute_profile_id=compute_profile.get('id'))
 
@@ -115,41 +307,55 @@ def ensure(module):
             compute_attribute = theforeman.create_compute_attribute(compute_resource_id=compute_resource.get('id'),
                                                                     compute_profile_id=compute_profile.get('id'),
                                                                     data={'vm_attrs': vm_attributes})
-            return True, compute_attribute
+            return True, compute_attribute, []
         except ForemanError as e:
             module.fail_json(msg='Could not create compute attribute: {0}'.format(e.message))
 
-    if not all(compute_attribute['vm_attrs'].get(key, vm_attributes.get(key)) == vm_attributes.get(key) for key in
-               vm_attributes) != 0:
+    changed_paths, vm_attrs = get_vm_attrs_update(vm_attributes, compute_attribute)
+    if changed_paths:
         try:
             compute_attribute = theforeman.update_compute_attribute(id=compute_attribute.get('id'),
-                                                                    data=vm_attributes)
-            return True, compute_attribute
+                                                                    data={'vm_attrs': vm_attrs})
+            return True, compute_attribute, changed_paths
         except ForemanError as e:
             module.fail_json(msg='Could not update compute attribute: {0}'.format(e.message))
 
-    return False, compute_attribute
+    return False, compute_attribute, changed_paths
 
 
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            compute_profile=dict(type='str', required=True),
-            compute_resource=dict(type='str', required=True),
+            compute_profile=dict(type='str', required=False),
+            compute_resource=dict(type='str', required=False),
             vm_attributes=dict(type='dict', required=False),
+            compute_attributes=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
+            resolve_names=dict(type='bool', default=False),
+            catalog_cache_ttl=dict(type='int', default=3600),
+            cache_dir=dict(type='path', required=False),
             foreman_host=dict(type='str', Default='127.0.0.1'),
             foreman_port=dict(type='str', Default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', required=False, default=True)
         ),
+        required_one_of=[['compute_profile', 'compute_attributes']],
+        required_together=[['compute_profile', 'compute_resource']],
+        mutually_exclusive=[['compute_profile', 'compute_attributes']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['compute_attributes']:
+        changed, compute_attributes = sync_compute_attributes(module)
+        module.exit_json(changed=changed, compute_attributes=compute_attributes)
 
-    changed, compute_attribute = ensure(module)
-    module.exit_json(changed=changed, compute_attribute=compute_attribute)
+    changed, compute_attribute, changed_paths = ensure(module)
+    module.exit_json(changed=changed, compute_attribute=compute_attribute, changed_paths=changed_paths)
 
 
 from ansible.module_utils.basic import *
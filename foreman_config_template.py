@@ -30,9 +30,24 @@ options:
     required: false
     default: None
   name:
-    description: Provision template name
-    required: true
+    description:
+    - Provision template name
+    - Either name or directory is required.
+    required: false
+    default: None
+  directory:
+    description:
+    - Directory to sync all provisioning templates from. Every file is a template which can start with a
+      Foreman metadata header (name, kind, snippet, locked, oses, organizations, locations), missing values are
+      taken from the other module options and the name defaults to the file name.
+    - Changed templates are uploaded in parallel, templates with another model in their metadata are skipped.
+    - Only state present is supported with directory.
+    required: false
     default: None
+  workers:
+    description: Number of parallel requests used by directory
+    required: false
+    default: 4
   locked:
     description: Whether or not the template is locked for editing
     required: false
@@ -70,6 +85,13 @@ options:
     required: false
     default: 'present'
     choices: ['present', 'absent']
+  cache_dir:
+    description:
+    - Directory to cache digests of applied templates in. If the template content and the desired attributes did
+      not change and the template was not modified in Foreman since it was applied, the template is neither read
+      from template_file nor fetched from Foreman.
+    required: false
+    default: None
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -114,8 +136,21 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Sync all provisioning templates from a directory
+  foreman_config_template:
+    directory: /srv/foreman/templates/provisioning
+    organizations:
+      - Development
+    cache_dir: ~/.cache/foreman
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
+import os
+
 try:
     from foreman.foreman import *
 
@@ -171,6 +206,59 @@ def get_resources(resource_type, resource_func, resource_specs, search_field='na
     return result
 
 
+def read_template_file(template_file, cache):
+    try:
+        with open(template_file) as f:
+            content = f.read()
+    except IOError as e:
+        module.fail_json(msg='Could not open file {0}: {1}'.format(template_file, e.message))
+    stat = os.stat(template_file)
+    cache.setdefault('files', dict())[os.path.abspath(template_file)] = dict(mtime=stat.st_mtime,
+                                                                            size=stat.st_size,
+                                                                            digest=content_digest(content))
+    return content
+
+
+def get_cached_file_digest(template_file, cache):
+    entry = cache.get('files', dict()).get(os.path.abspath(template_file))
+    if not entry:
+        return None
+    try:
+        stat = os.stat(template_file)
+    except OSError:
+        return None
+    if entry.get('mtime') != stat.st_mtime or entry.get('size') != stat.st_size:
+        return None
+    return entry.get('digest')
+
+
+def get_template_digest(data, template_digest=None):
+    digest_data = dict((key, value) for key, value in data.items() if key not in ['audit_comment', 'operatingsystems'])
+    if 'template' in digest_data:
+        digest_data['template'] = content_digest(digest_data['template'])
+    elif template_digest:
+        digest_data['template'] = template_digest
+    return data_digest(digest_data)
+
+
+def update_template(theforeman, config_template, data):
+    # Foreman rejects changes to a locked template as well as changes combined with (un)locking it.
+    # The body is sent once with the template unlocked, the lock is toggled with body-less updates.
+    template_id = config_template.get('id')
+    locked = data.get('locked', config_template['locked'])
+    payload = dict((key, value) for key, value in data.items() if key != 'locked')
+    if payload.get('template') == config_template.get('template'):
+        payload.pop('template', None)
+
+    if config_template['locked']:
+        config_template = theforeman.update_config_template(id=template_id, data={'locked': False})
+    if not templates_equal(payload, config_template):
+        config_template = theforeman.update_config_template(id=template_id, data=payload)
+    if locked:
+        config_template = theforeman.update_config_template(id=template_id, data={'locked': True})
+    return config_template
+
+
 def ensure():
     audit_comment = module.params['audit_comment']
     locked = module.params['locked']
@@ -190,8 +278,6 @@ def ensure():
 
     try:
         config_template = theforeman.search_config_template(data=data)
-        if config_template:
-            config_template = theforeman.get_config_template(id=config_template.get('id'))
     except ForemanError as e:
         module.fail_json(msg='Could not get config template: {0}'.format(e.message))
 
@@ -204,16 +290,18 @@ def ensure():
                 module.fail_json(msg='Could not delete config template: {0}'.format(e.message))
 
     if state == 'present':
+        cache = load_cache(module, 'config_templates')
+        template_digest = None
+
         if template and template_file:
             module.fail_json(msg='Only one of either template or template_file must be defined')
         if template:
             data['template'] = template
         elif template_file:
-            try:
-                with open(template_file) as f:
-                    data['template'] = f.read()
-            except IOError as e:
-                module.fail_json(msg='Could not open file {0}: {1}'.format(template_file, e.message))
+            # The file is only read if it changed since its digest was cached
+            template_digest = get_cached_file_digest(template_file, cache)
+            if not template_digest:
+                data['template'] = read_template_file(template_file, cache)
 
         data['audit_comment'] = audit_comment
         if locked:
@@ -241,36 +329,133 @@ def ensure():
                                                      resource_specs=operatingsystems,
                                                      search_field='title')
 
+        digest = get_template_digest(data, template_digest)
+
+        # Neither the template nor the desired state changed since it was applied the last time
+        if config_template and digest_unchanged(cache, 'templates', config_template, digest):
+            return False, config_template
+
+        if template_file and 'template' not in data:
+            data['template'] = read_template_file(template_file, cache)
+
+        try:
+            if config_template:
+                config_template = theforeman.get_config_template(id=config_template.get('id'))
+        except ForemanError as e:
+            module.fail_json(msg='Could not get config template: {0}'.format(e.message))
+
         if not config_template:
             try:
                 config_template = theforeman.create_config_template(data=data)
-                return True, config_template
             except ForemanError as e:
                 module.fail_json(msg='Could not create config template: {0}'.format(e.message))
+            remember_digest(cache, 'templates', config_template, digest)
+            save_cache(module, 'config_templates', cache)
+            return True, config_template
 
         if not templates_equal(data, config_template):
             try:
-                if config_template['locked']:
-                    unlock = {'id': config_template.get('id'), 'locked': False}
-                    theforeman.update_config_template(id=config_template.get('id'), data=unlock)
-                if data.get('locked', config_template['locked']):
-                    data['locked'] = False
-                    theforeman.update_config_template(id=config_template.get('id'), data=data)
-                    data['locked'] = True
-                config_template = theforeman.update_config_template(id=config_template.get('id'), data=data)
-                return True, config_template
+                config_template = update_template(theforeman, config_template, data)
             except ForemanError as e:
                 module.fail_json(msg='Could not update config template: {0}'.format(e.message))
+            remember_digest(cache, 'templates', config_template, digest)
+            save_cache(module, 'config_templates', cache)
+            return True, config_template
+
+        remember_digest(cache, 'templates', config_template, digest)
+        save_cache(module, 'config_templates', cache)
 
     return False, config_template
 
 
+def get_directory_template_data(theforeman, indexes, entry):
+    metadata = entry['metadata']
+    data = dict(name=entry['name'], template=entry['content'])
+    data['audit_comment'] = module.params['audit_comment']
+
+    kind = metadata.get('kind', module.params['template_kind_name'])
+    if metadata.get('snippet', module.params['snippet']) or kind == 'snippet':
+        data['snippet'] = True
+    elif kind:
+        data['template_kind_id'] = get_indexed_ids(module, theforeman, indexes, 'template_kinds', [kind])[0]
+    locked = metadata.get('locked', module.params['locked'])
+    if locked:
+        data['locked'] = locked
+
+    organizations = metadata.get('organizations', module.params['organizations'])
+    if organizations is not None:
+        data['organization_ids'] = get_indexed_ids(module, theforeman, indexes, 'organizations', organizations)
+    locations = metadata.get('locations', module.params['locations'])
+    if locations is not None:
+        data['location_ids'] = get_indexed_ids(module, theforeman, indexes, 'locations', locations)
+    operatingsystems = metadata.get('oses', module.params['operatingsystems'])
+    if operatingsystems is not None:
+        # Like the template metadata of Foreman, an operatingsystem name matches all its versions
+        data['operatingsystem_ids'] = get_indexed_ids(module, theforeman, indexes, 'operatingsystems',
+                                                      operatingsystems, all_matches=True)
+    return data
+
+
+def sync_directory():
+    workers = module.params['workers']
+
+    theforeman = init_foreman_client(module)
+    cache = load_cache(module, 'config_templates')
+    indexes = dict()
+
+    entries = read_template_directory(module, module.params['directory'], 'ProvisioningTemplate')
+    config_templates = get_resource_index(module, theforeman, indexes, 'config_templates', keys=('name',))
+
+    for entry in entries:
+        entry['data'] = get_directory_template_data(theforeman, indexes, entry)
+        entry['digest'] = get_template_digest(entry['data'])
+        entry['config_template'] = config_templates.get(entry['name'])
+        entry['action'] = 'unchanged' if entry['config_template'] else 'created'
+
+    # Templates whose digest is not known to be applied have to be compared to their content in Foreman
+    unknown = [entry for entry in entries if entry['config_template'] and
+               not digest_unchanged(cache, 'templates', entry['config_template'], entry['digest'])]
+    for entry, config_template, error in run_parallel(
+            lambda item: theforeman.get_config_template(id=item['config_template'].get('id')), unknown, workers):
+        if error:
+            module.fail_json(msg='Could not get config template {0}: {1}'.format(entry['name'], error))
+        entry['config_template'] = config_template
+        if templates_equal(entry['data'], config_template):
+            remember_digest(cache, 'templates', config_template, entry['digest'])
+        else:
+            entry['action'] = 'updated'
+
+    def apply(entry):
+        if entry['config_template']:
+            return update_template(theforeman, entry['config_template'], dict(entry['data']))
+        return theforeman.create_config_template(data=entry['data'])
+
+    errors = []
+    for entry, config_template, error in run_parallel(apply, [item for item in entries
+                                                              if item['action'] != 'unchanged'], workers):
+        if error:
+            entry['action'] = 'failed'
+            errors.append('{0}: {1}'.format(entry['name'], error))
+        else:
+            remember_digest(cache, 'templates', config_template, entry['digest'])
+    save_cache(module, 'config_templates', cache)
+
+    results = [dict(name=entry['name'], path=entry['path'], action=entry['action']) for entry in entries]
+    changed = any(entry['action'] in ['created', 'updated'] for entry in entries)
+    if errors:
+        module.fail_json(msg='Could not sync config templates: {0}'.format('; '.join(errors)),
+                         changed=changed, templates=results)
+    return changed, results
+
+
 def main():
     global module
     module = AnsibleModule(
         argument_spec=dict(
             audit_comment=dict(type='str', required=False),
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            directory=dict(type='path', required=False),
+            workers=dict(type='int', default=4),
             locked=dict(type='bool', required=False),
             operatingsystems=dict(type='list', required=False),
             template=dict(type='str', required=False),
@@ -280,12 +465,15 @@ def main():
             organizations=dict(type='list', required=False),
             locations=dict(type='list', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
+            cache_dir=dict(type='path', required=False),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'directory']],
+        mutually_exclusive=[['name', 'directory'], ['template', 'directory'], ['template_file', 'directory']],
     )
 
     if not foremanclient_found:
@@ -293,6 +481,12 @@ def main():
     if has_import_error:
         module.fail_json(msg=import_error_msg)
 
+    if module.params['directory']:
+        if module.params['state'] == 'absent':
+            module.fail_json(msg='state absent is not supported with directory')
+        changed, config_templates = sync_directory()
+        module.exit_json(changed=changed, config_templates=config_templates)
+
     changed, config_template = ensure()
     module.exit_json(changed=changed, config_template=config_template)
 
@@ -24,8 +24,8 @@ description:
 - Create and delete Foreman Domain using Foreman API v2
 options:
   name:
-    description: Domain name
-    required: true
+    description: Domain name. Mutually exclusive with domains.
+    required: false
   fullname:
     description: Description of the domain
     required: false
@@ -43,6 +43,17 @@ options:
   locations:
     description: List of locations the domain should be assigned to
     required: false
+  domains:
+    description:
+    - List of domains, each defined by name and the options of a single domain. Mutually exclusive with name.
+    - All domains are listed once, smart proxies, organizations and locations are resolved once for all domains
+      and changes are applied in parallel.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used by domains
+    required: false
+    default: 4
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -84,6 +95,25 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure internal zones
+  foreman_domain:
+    domains:
+    - name: dc1.example.com
+      dns_proxy: dns01.example.com
+      locations:
+      - Cardiff
+    - name: dc2.example.com
+      dns_proxy: dns02.example.com
+      locations:
+      - London
+    - name: old.example.com
+      state: absent
+    workers: 8
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -135,6 +165,63 @@ def get_resources(resource_type, resource_specs, theforeman):
     return result
 
 
+def sync_domains(module):
+    comparable_keys = ['name', 'fullname']
+    workers = module.params['workers']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        domains = index_resources(get_all_resources(theforeman, 'domains'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get domains: {0}'.format(e.message))
+
+    defined = []
+    for item in module.params['domains']:
+        state = item.get('state', 'present')
+        data = {'name': item.get('name'), 'fullname': item.get('fullname')}
+        if state == 'present':
+            if item.get('organizations'):
+                data['organization_ids'] = get_indexed_ids(module, theforeman, indexes, 'organizations',
+                                                           item.get('organizations'))
+            if item.get('locations'):
+                data['location_ids'] = get_indexed_ids(module, theforeman, indexes, 'locations',
+                                                       item.get('locations'))
+            if item.get('dns_proxy'):
+                data['dns_id'] = get_indexed_ids(module, theforeman, indexes, 'smart_proxies',
+                                                 [item.get('dns_proxy')])[0]
+        defined.append(dict(name=item.get('name'), state=state, data=data))
+
+    # Organizations and locations are not part of the domain listing
+    existing = [domains[domain['name']] for domain in defined
+                if domain['state'] == 'present' and domain['name'] in domains and
+                ('organization_ids' in domain['data'] or 'location_ids' in domain['data'])]
+    for found, domain, error in run_parallel(lambda found: theforeman.get_domain(id=found.get('id')),
+                                             existing, workers):
+        if error:
+            module.fail_json(msg='Could not get domain {0}: {1}'.format(found.get('name'), error))
+        domains[found.get('name')] = domain
+
+    changes = []
+    for item in defined:
+        domain = domains.get(item['name'])
+        action = get_sync_action(item['state'], domain,
+                                 lambda domain: domains_equal(item['data'], domain, comparable_keys))
+        changes.append(dict(name=item['name'], action=action, data=item['data'], domain=domain,
+                            result=dict(name=item['name'], action=action)))
+
+    changed, results, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_domain(data=change['data']),
+        update=lambda change: theforeman.update_domain(id=change['domain'].get('id'), data=change['data']),
+        delete=lambda change: theforeman.delete_domain(id=change['domain'].get('id')),
+        workers=workers)
+    if errors:
+        module.fail_json(msg='Could not sync domains: {0}'.format('; '.join(errors)), changed=changed, domains=results)
+    return changed, results
+
+
 def ensure(module):
     comparable_keys = ['name', 'fullname']
     name = module.params['name']
@@ -196,22 +283,32 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
             fullname=dict(type='str', required=False),
             dns_proxy=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             organizations=dict(type='list', required=False),
             locations=dict(type='list', required=False),
+            domains=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'domains']],
+        mutually_exclusive=[['name', 'domains']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['domains']:
+        changed, domains = sync_domains(module)
+        module.exit_json(changed=changed, domains=domains)
 
     changed, domain = ensure(module)
     module.exit_json(changed=changed, domain=domain)
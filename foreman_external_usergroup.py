@@ -24,21 +24,48 @@ module: foreman_external_usergroup
 short_description: Manage Foreman External Usergroup using Foreman API v2
 description:
 - Create and delete Foreman External Usergroups using Foreman API v2
+- Refresh the members of usergroups from their external usergroups
 options:
   name:
-    description: name of the external usergroup
-    required: true
+    description: name of the external usergroup. Required unless external_usergroups is used or state is refreshed.
+    required: false
   auth_source:
-    description: auth source of this usergroup
-    required: true
+    description: auth source of this usergroup. Required unless external_usergroups is used or state is refreshed.
+    required: false
   usergroup:
-    description: usergroup to link to.
-    required: true
+    description: usergroup to link to. Required unless external_usergroups is used or state is refreshed.
+    required: false
+  external_usergroups:
+    description:
+    - List of external usergroups, each defined by name, usergroup, auth_source and an optional state.
+    - Mutually exclusive with name. Usergroups and auth sources are resolved once, changes are applied in parallel.
+    required: false
+    default: None
+  usergroups:
+    description:
+    - Usergroups whose external usergroups are refreshed from their auth source if state is refreshed.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used by external_usergroups and refreshes
+    required: false
+    default: 4
+  auth_source_workers:
+    description: Maximum number of parallel refresh requests per auth source
+    required: false
+    default: 2
+  auth_source_interval:
+    description:
+    - Minimum number of seconds between the starts of two refresh requests of the same auth source.
+      0 only limits the refreshes by auth_source_workers.
+    required: false
+    default: 0
   state:
-    description: State of usergroup
+    description:
+    - State of usergroup. refreshed updates the members of usergroups from all their external usergroups.
     required: false
     default: present
-    choices: ["present", "absent"]
+    choices: ["present", "absent", "refreshed"]
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -59,7 +86,6 @@ options:
     default: true
 notes:
 - Requires the python-foreman package to be installed. See https://github.com/Nosmoht/python-foreman.
-- This module does currently not update already existing groups
 version_added: "2.0"
 author: "Guido Gúnther (@agx)"
 '''
@@ -75,14 +101,202 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure LDAP groups are linked to foreman usergroups
+  foreman_external_usergroup:
+    external_usergroups:
+    - name: wheel
+      auth_source: LDAP-Server
+      usergroup: admin
+    - name: developers
+      auth_source: LDAP-Server
+      usergroup: developers
+    - name: interns
+      auth_source: LDAP-Server
+      usergroup: developers
+      state: absent
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Refresh the members of usergroups from LDAP
+  foreman_external_usergroup:
+    usergroups:
+    - admin
+    - developers
+    state: refreshed
+    workers: 8
+    auth_source_workers: 2
+    auth_source_interval: 0.5
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
+import threading
+import time
+
 try:
     from foreman.foreman import *
     foremanclient_found = True
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def get_auth_source_id(ext_group):
+    return ext_group.get('auth_source_id', (ext_group.get('auth_source_ldap') or {}).get('id'))
+
+
+def get_user_logins(usergroup):
+    return set(user.get('login') for user in usergroup.get('users') or [])
+
+
+def interleave_by(items, key):
+    """Order items round robin by key so that parallel workers do not queue up on the same key."""
+    groups = dict()
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    result = []
+    while groups:
+        for k in sorted(groups.keys()):
+            result.append(groups[k].pop(0))
+            if not groups[k]:
+                del groups[k]
+    return result
+
+
+def sync_external_usergroups(module):
+    workers = module.params['workers']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    items = module.params['external_usergroups']
+    for item in items:
+        if not all(item.get(key) for key in ['name', 'usergroup', 'auth_source']):
+            module.fail_json(msg='Every external usergroup requires name, usergroup and auth_source: {0}'.format(item))
+
+    usergroups = get_indexed_resources(module, theforeman, indexes, 'usergroups',
+                                       sorted(set(item['usergroup'] for item in items)))
+    auth_sources = sorted(set(item['auth_source'] for item in items))
+    auth_source_ids = dict(zip(auth_sources,
+                               get_indexed_ids(module, theforeman, indexes, 'auth_source_ldaps', auth_sources)))
+
+    ext_groups = dict()
+    for usergroup, result, error in run_parallel(lambda usergroup: theforeman.get_external_usergroups(usergroup['id']),
+                                                 usergroups, workers):
+        if error:
+            module.fail_json(msg='Could not get external usergroups for {0}: {1}'.format(usergroup['name'], error))
+        ext_groups[usergroup['name']] = index_resources(result)
+
+    usergroups = index_resources(usergroups)
+    changes = []
+    for item in items:
+        usergroup = usergroups[item['usergroup']]
+        ext_group = ext_groups[item['usergroup']].get(item['name'])
+        auth_source_id = auth_source_ids[item['auth_source']]
+        action = get_sync_action(item.get('state', 'present'), ext_group,
+                                 lambda found: get_auth_source_id(found) == auth_source_id)
+        changes.append(dict(name='{0}/{1}'.format(item['usergroup'], item['name']), action=action,
+                            usergroup=usergroup, ext_group=ext_group,
+                            data=dict(name=item['name'], usergroup_id=usergroup['id'], auth_source_id=auth_source_id),
+                            result=dict(name=item['name'], usergroup=item['usergroup'], action=action)))
+
+    changed, results, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_external_usergroup(change['usergroup']['id'], data=change['data']),
+        update=lambda change: theforeman.update_resource(resource_type='usergroups',
+                                                         resource_id=change['usergroup']['id'],
+                                                         data=change['data'], component='external_usergroups',
+                                                         component_id=change['ext_group']['id']),
+        delete=lambda change: theforeman.delete_external_usergroup(group_id=change['usergroup']['id'],
+                                                                   ext_group_id=change['ext_group']['id']),
+        workers=workers)
+    if errors:
+        module.fail_json(msg='Could not sync external usergroups: {0}'.format('; '.join(errors)),
+                         changed=changed, external_usergroups=results)
+    return changed, results
+
+
+def refresh_usergroups(module):
+    workers = module.params['workers']
+    auth_source_workers = module.params['auth_source_workers']
+    auth_source_interval = module.params['auth_source_interval']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    usergroups = get_indexed_resources(module, theforeman, indexes, 'usergroups', module.params['usergroups'])
+
+    def get_details(usergroup):
+        return (theforeman.get_usergroup(id=usergroup['id']),
+                theforeman.get_external_usergroups(usergroup['id']))
+
+    before = dict()
+    refreshes = []
+    for usergroup, details, error in run_parallel(get_details, usergroups, workers):
+        if error:
+            module.fail_json(msg='Could not get usergroup {0}: {1}'.format(usergroup['name'], error))
+        before[usergroup['id']] = get_user_logins(details[0])
+        for ext_group in details[1]:
+            refreshes.append(dict(usergroup=usergroup, ext_group=ext_group))
+
+    # Concurrency and start interval of the refreshes of each auth source
+    limits = dict((get_auth_source_id(r['ext_group']), dict(semaphore=threading.BoundedSemaphore(auth_source_workers),
+                                                            lock=threading.Lock(), next_start=0))
+                  for r in refreshes)
+
+    def refresh(item):
+        limit = limits[get_auth_source_id(item['ext_group'])]
+        with limit['semaphore']:
+            with limit['lock']:
+                start = max(limit['next_start'], time.time())
+                limit['next_start'] = start + auth_source_interval
+            time.sleep(max(start - time.time(), 0))
+            return theforeman.update_resource(resource_type='usergroups',
+                                              resource_id=item['usergroup']['id'],
+                                              data={},
+                                              component='external_usergroups',
+                                              component_id='{0}/refresh'.format(item['ext_group']['id']))
+
+    errors = dict()
+    refreshes = interleave_by(refreshes, lambda item: get_auth_source_id(item['ext_group']))
+    for item, result, error in run_parallel(refresh, refreshes, workers):
+        if error:
+            errors.setdefault(item['usergroup']['id'], []).append('{0}: {1}'.format(item['ext_group']['name'], error))
+
+    results = []
+    changed = False
+    for usergroup, details, error in run_parallel(lambda usergroup: theforeman.get_usergroup(id=usergroup['id']),
+                                                  usergroups, workers):
+        result = dict(name=usergroup['name'], action='refreshed')
+        if usergroup['id'] in errors:
+            result.update(action='failed', error='; '.join(errors[usergroup['id']]))
+        if error:
+            result.update(action='failed', error=error)
+        else:
+            logins = get_user_logins(details)
+            result.update(users_added=sorted(logins - before[usergroup['id']]),
+                          users_removed=sorted(before[usergroup['id']] - logins))
+            changed = changed or bool(result['users_added'] or result['users_removed'])
+        results.append(result)
+
+    failed = ['{0}: {1}'.format(result['name'], result['error']) for result in results if result['action'] == 'failed']
+    if failed:
+        module.fail_json(msg='Could not refresh usergroups: {0}'.format('; '.join(failed)),
+                         changed=changed, usergroups=results)
+    return changed, results
+
 
 def get_id(module, theforeman, res_type, name, field='name'):
     result = None
@@ -160,20 +374,41 @@ def ensure(module):
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            state=dict(type='str', default='present', choices=['present', 'absent']),
-            name=dict(type='str', required=True),
-            usergroup=dict(type='str', required=True),
-            auth_source=dict(type='str', required=True),
+            state=dict(type='str', default='present', choices=['present', 'absent', 'refreshed']),
+            name=dict(type='str', required=False),
+            usergroup=dict(type='str', required=False),
+            auth_source=dict(type='str', required=False),
+            external_usergroups=dict(type='list', required=False),
+            usergroups=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
+            auth_source_workers=dict(type='int', default=2),
+            auth_source_interval=dict(type='float', default=0),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_if=[['state', 'refreshed', ['usergroups']]],
+        mutually_exclusive=[['name', 'external_usergroups']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['state'] == 'refreshed':
+        changed, usergroups = refresh_usergroups(module)
+        module.exit_json(changed=changed, usergroups=usergroups)
+
+    if module.params['external_usergroups']:
+        changed, external_usergroups = sync_external_usergroups(module)
+        module.exit_json(changed=changed, external_usergroups=external_usergroups)
+
+    missing = [key for key in ['name', 'usergroup', 'auth_source'] if not module.params[key]]
+    if missing:
+        module.fail_json(msg='missing required arguments: {0}'.format(', '.join(missing)))
 
     changed, usergroup = ensure(module)
     module.exit_json(changed=changed, usergroup=usergroup)
@@ -39,6 +39,11 @@ options:
     required: false
     default: present
     choices: ["present", "absent"]
+  cache_dir:
+    description:
+    - Directory to cache the permission catalog in. The catalog is fetched again once the Foreman version changes.
+    required: false
+    default: None
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -84,19 +89,21 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
 def get_permission_ids(module, theforeman, resource_type, permissions):
-    result = []
-    for i in range(0, len(permissions)):
-        try:
-            permission = theforeman.search_permission(data={'resource_type': resource_type,
-                                                            'name': permissions[i]})
-            if not permission:
-                module.fail_json(msg='Could not find Permission {0} for {1}'.format(permissions[i],
-                                                                                    resource_type))
-            result.append(permission.get('id'))
-        except ForemanError as e:
-            module.fail_json(msg='Could not get Permissions: {0}'.format(e.message))
-    return result
+    permission_index = get_permission_index(module, theforeman)
+    missing = [name for name in permissions if (resource_type, name) not in permission_index]
+    if missing:
+        module.fail_json(msg='Could not find Permission {0} for {1}'.format(', '.join(missing), resource_type))
+    return [permission_index[(resource_type, name)] for name in permissions]
 
 
 def get_role_id(module, theforeman, rolename):
@@ -176,6 +183,7 @@ def main():
             role=dict(type='str', required=True),
             resource_type=dict(type='str', required=True),
             permissions=dict(type='list', required=True),
+            cache_dir=dict(type='path', required=False),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
@@ -186,6 +194,8 @@ def main():
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
 
     changed, filtr = ensure(module)
     module.exit_json(changed=changed, filter=filtr)
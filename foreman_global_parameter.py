@@ -25,10 +25,24 @@ description:
 options:
   name:
     description: Global parameter name
-    required: true
+    required: false
   value:
     description: parameter value
-    required: true
+    required: false
+  parameters:
+    description:
+    - List of global parameters, each defined by name, value and an optional state. Mutually exclusive with name.
+    - Dict and list values are stored as JSON.
+    - All global parameters are listed once, changes are applied in parallel.
+    required: false
+  prune:
+    description: Delete all global parameters which are not defined in parameters
+    required: false
+    default: false
+  workers:
+    description: Number of parallel requests used by parameters
+    required: false
+    default: 4
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -63,14 +77,106 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure exactly these Global parameters
+  foreman_global_parameter:
+    parameters:
+    - name: baud
+      value: 115200
+    - name: ntp_server
+      value: ntp.example.com
+    prune: true
+    foreman_host: foreman.example.com
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
+import json
+
 try:
     from foreman.foreman import *
     foremanclient_found = True
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def get_parameter_value(value):
+    # Foreman stores values as text, YAML booleans are stored as true and false and structures as JSON
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    if value is None:
+        return None
+    return str(value)
+
+
+def get_compared_parameter_value(value):
+    # Stored JSON structures may differ in key order and whitespace only
+    value = get_parameter_value(value)
+    try:
+        structure = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    if isinstance(structure, (dict, list)):
+        return json.dumps(structure, sort_keys=True)
+    return value
+
+
+def parameter_values_equal(value, stored_value):
+    return get_compared_parameter_value(value) == get_compared_parameter_value(stored_value)
+
+
+def sync_parameters(module):
+    workers = module.params['workers']
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        global_parameters = index_resources(get_all_resources(theforeman, 'common_parameters'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get global parameters: {0}'.format(e.message))
+
+    changes = []
+    defined = set()
+    for item in module.params['parameters']:
+        name = item.get('name')
+        defined.add(name)
+        global_parameter = global_parameters.get(name)
+        data = {'name': name, 'value': get_parameter_value(item.get('value'))}
+        action = get_sync_action(item.get('state', 'present'), global_parameter,
+                                 lambda found: parameter_values_equal(data['value'], found['value']))
+        changes.append(dict(name=name, action=action, data=data, global_parameter=global_parameter,
+                            result=dict(name=name, action=action)))
+
+    if module.params['prune']:
+        for name in sorted(set(global_parameters.keys()) - defined):
+            changes.append(dict(name=name, action='deleted', global_parameter=global_parameters[name],
+                                result=dict(name=name, action='deleted')))
+
+    changed, results, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_common_parameter(data=change['data']),
+        update=lambda change: theforeman.update_resource(resource_type='common_parameters',
+                                                         resource_id=change['global_parameter'].get('id'),
+                                                         data=change['data']),
+        delete=lambda change: theforeman.delete_common_parameter(id=change['global_parameter'].get('id')),
+        workers=workers)
+    if errors:
+        module.fail_json(msg='Could not sync global parameters: {0}'.format('; '.join(errors)),
+                         changed=changed, global_parameters=results)
+    return changed, results
+
+
 def ensure(module):
     global theforeman
 
@@ -132,8 +238,11 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
-            value=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            value=dict(type='str', required=False),
+            parameters=dict(type='list', required=False),
+            prune=dict(type='bool', default=False),
+            workers=dict(type='int', default=4),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
@@ -141,10 +250,19 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'parameters']],
+        required_together=[['name', 'value']],
+        mutually_exclusive=[['name', 'parameters']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['parameters'] is not None:
+        changed, global_parameters = sync_parameters(module)
+        module.exit_json(changed=changed, global_parameters=global_parameters)
 
     changed, global_parameter = ensure(module)
     module.exit_json(changed=changed, global_parameter=global_parameter)
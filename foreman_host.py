@@ -27,6 +27,38 @@ options:
     description: Hostgroup name
     required: false
     default: None
+  hosts:
+    description:
+    - List of host names to reboot in rolling batches, only valid with state rebooted.
+    - Mutually exclusive with name.
+    required: false
+    default: None
+  batch_size:
+    description: Number of hosts of I(hosts) rebooted at the same time
+    required: false
+    default: 1
+  max_unavailable:
+    description:
+    - Maximum number of hosts of I(hosts) that may be unavailable at the same time, including hosts which
+      did not become healthy again. The rollout stops once this limit is reached by failed hosts.
+    required: false
+    default: 1
+  reboot_timeout:
+    description: Seconds to wait for a batch of I(hosts) to become healthy
+    required: false
+    default: 600
+  poll_interval:
+    description: Seconds between two health checks of a batch of I(hosts)
+    required: false
+    default: 10
+  wait_for_report:
+    description:
+    - A rebooted host of I(hosts) is only healthy once it sent a new report to Foreman. Hosts without a puppet
+      proxy and without any report are checked by their power state instead.
+    - Otherwise a host is healthy once its power state was seen off and on again. Foreman may report
+      the power state as on during the whole reboot, so a short I(poll_interval) is needed to see it off.
+    required: false
+    default: false
   architecture:
     description: Architecture name
     required: false
@@ -145,6 +177,22 @@ options:
     description: compute attributes (can contain nested volume_attributes)
     required: false
     default: None
+  resolve_names:
+    description:
+    - Resolve names of clusters, networks, datastores, storage domains and storage pods used in compute_attributes
+      and interfaces_attributes to their ids using the available_* catalogs of the compute resource.
+      Values which are no known name are kept.
+    - Resource pools are not resolved, as Foreman lists them per cluster only. Use their ids.
+    required: false
+    default: false
+  catalog_cache_ttl:
+    description: Seconds the available_* catalogs of a compute resource are cached in cache_dir
+    required: false
+    default: 3600
+  cache_dir:
+    description: Directory to cache the available_* catalogs of compute resources in
+    required: false
+    default: None
   content_source:
     description: content source (smart proxy or capsule)
     default: None
@@ -186,6 +234,7 @@ version_added: "2.0"
 author: "Thomas Krahn (@nosmoht)"
 '''
 
+import time
 
 try:
     from foreman.foreman import *
@@ -228,6 +277,108 @@ def resolve_subnet_names(interfaces, theforeman):
             iface['subnet_id'] = iface_subnet.get('id')
 
 
+def get_host_name(name, domain_name):
+    if domain_name and domain_name not in name:
+        return '{name}.{domain}'.format(name=name, domain=domain_name)
+    return name
+
+
+def host_power_on(theforeman, host):
+    power = theforeman.get_host_power(host_id=host.get('id'))
+    return power.get('power') in ['on', 'poweredOn']
+
+
+def rolling_reboot():
+    host_names = [get_host_name(name, module.params['domain']) for name in module.params['hosts']]
+    batch_size = module.params['batch_size']
+    max_unavailable = module.params['max_unavailable']
+    reboot_timeout = module.params['reboot_timeout']
+    poll_interval = module.params['poll_interval']
+    wait_for_report = module.params['wait_for_report']
+    workers = max(batch_size, 1)
+
+    if batch_size < 1 or max_unavailable < 1:
+        module.fail_json(msg='batch_size and max_unavailable must be greater than 0')
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        hosts = index_resources(search_resources_by_values(theforeman, 'hosts', 'name', host_names))
+    except ForemanError as e:
+        module.fail_json(msg='Error while searching hosts: {0}'.format(e.message))
+
+    missing = [name for name in host_names if name not in hosts]
+    if missing:
+        module.fail_json(msg='Hosts not found: {0}'.format(', '.join(missing)))
+
+    results = []
+    failed = []
+    pending = list(host_names)
+    while pending:
+        size = min(batch_size, max_unavailable - len(failed))
+        if size < 1:
+            module.fail_json(msg='Stopped rolling reboot, {0} hosts did not become healthy: {1}'.format(
+                len(failed), ', '.join(failed)), hosts=results, skipped=pending)
+        batch = pending[:size]
+        pending = pending[size:]
+        started = time.time()
+
+        def reboot(name):
+            # The last report right before the power action is the baseline, an earlier one could be older
+            host = theforeman.get_host(id=hosts[name].get('id'))
+            theforeman.reboot_host(host_id=hosts[name].get('id'))
+            return host
+
+        reporting = set()
+        last_reports = dict()
+        for name, host, error in run_parallel(reboot, batch, workers):
+            if error:
+                module.fail_json(msg='Could not reboot host {0}: {1}'.format(name, error), hosts=results)
+            last_reports[name] = host.get('last_report')
+            if wait_for_report and (host.get('puppet_proxy_id') or host.get('last_report')):
+                reporting.add(name)
+
+        # Foreman keeps reporting power on while a host reboots, so power on alone is no evidence of a
+        # completed reboot. A host is healthy after a new report or after its power was seen off and on again.
+        unhealthy = list(batch)
+        powered_off = set()
+        while unhealthy and time.time() - started < reboot_timeout:
+            time.sleep(poll_interval)
+            healthy = []
+            waiting_for_report = [name for name in unhealthy if name in reporting]
+            if waiting_for_report:
+                try:
+                    reported = search_resources_by_values(theforeman, 'hosts', 'name', waiting_for_report)
+                except ForemanError as e:
+                    module.fail_json(msg='Error while searching hosts: {0}'.format(e.message), hosts=results)
+                healthy = [item.get('name') for item in reported
+                           if item.get('last_report') and item.get('last_report') != last_reports.get(item.get('name'))]
+            waiting_for_power = [name for name in unhealthy if name not in reporting]
+            if waiting_for_power:
+                for name, power_on, error in run_parallel(lambda name: host_power_on(theforeman, hosts[name]),
+                                                          waiting_for_power, workers):
+                    if error:
+                        continue
+                    if not power_on:
+                        powered_off.add(name)
+                    elif name in powered_off:
+                        healthy.append(name)
+            for name in healthy:
+                if name in unhealthy:
+                    unhealthy.remove(name)
+                    results.append(dict(name=name, healthy=True, elapsed=int(time.time() - started)))
+
+        for name in unhealthy:
+            failed.append(name)
+            results.append(dict(name=name, healthy=False, elapsed=int(time.time() - started)))
+
+    if failed:
+        module.fail_json(msg='Hosts did not become healthy after reboot: {0}'.format(', '.join(failed)),
+                         hosts=results)
+
+    return True, results
+
+
 def hosts_equal(data, host):
     # Match only keys defined in data
     if not all(str(data.get(key, None)) == str(host.get(key, None)) for key in set(data.keys())):
@@ -276,13 +427,7 @@ def ensure():
 
     theforeman = init_foreman_client(module)
 
-    if domain_name:
-        if domain_name in name:
-            host_name = name
-        else:
-            host_name = '{name}.{domain}'.format(name=name, domain=domain_name)
-    else:
-        host_name = name
+    host_name = get_host_name(name, domain_name)
 
     data = dict(name=host_name)
 
@@ -334,11 +479,12 @@ def ensure():
 
         # Image
         if image_name:
-            compute_resource_images = compute_resource.get('images')
-            if not compute_resource_images:
+            try:
+                image_index = get_image_index(theforeman, compute_resource.get('id'))
+            except ForemanError as e:
                 module.fail_json(
-                    msg='Compute Resource {0} has no images'.format(compute_resource_name))
-            images = filter(lambda x: x['name'] == image_name, compute_resource_images)
+                    msg='Could not get images of compute resource {0}: {1}'.format(compute_resource_name, e.message))
+            images = image_index.get(image_name, [])
             if len(images) == 0:
                 module.fail_json(
                     msg='Could not find image {image_name} in compute resource {compute_resource}'.format(
@@ -346,7 +492,7 @@ def ensure():
             if len(images) > 1:
                 module.fail_json(
                     msg='Found {count} images named {image_name} in compute resource {compute_resource}'.format(
-                        count=len(images), image_name=image_name, compute_resource=compute_resource_images))
+                        count=len(images), image_name=image_name, compute_resource=compute_resource_name))
             image = images[0]
             data['image_id'] = image.get('id')
 
@@ -508,6 +654,14 @@ def ensure():
         data['owner_id'] = usergroup.get('id')
         data['owner_type'] = 'Usergroup'
 
+    # Names in compute attributes
+    if module.params['resolve_names'] and compute_resource_name:
+        catalogs = dict()
+        compute_attributes = resolve_compute_resource_names(module, theforeman, compute_resource.get('id'),
+                                                            compute_attributes, catalogs)
+        interfaces_attributes = resolve_compute_resource_names(module, theforeman, compute_resource.get('id'),
+                                                               interfaces_attributes, catalogs)
+
     # compute attributes
     if compute_attributes:
         data['compute_attributes'] = compute_attributes
@@ -697,7 +851,13 @@ def main():
     global module
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            hosts=dict(type='list', required=False),
+            batch_size=dict(type='int', default=1),
+            max_unavailable=dict(type='int', default=1),
+            reboot_timeout=dict(type='int', default=600),
+            poll_interval=dict(type='int', default=10),
+            wait_for_report=dict(type='bool', default=False),
             architecture=dict(type='str', default='x86_64'),
             build=dict(type='bool', default=False),
             compute_profile=dict(type='str', default=None),
@@ -731,6 +891,9 @@ def main():
             owner_user_name=dict(type='str', default=None),
             owner_usergroup_name=dict(type='str', default=None),
             compute_attributes=dict(type='dict', required=False),
+            resolve_names=dict(type='bool', default=False),
+            catalog_cache_ttl=dict(type='int', default=3600),
+            cache_dir=dict(type='path', required=False),
             content_source=dict(type='str', required=False),
             content_view=dict(type='str', required=False),
             lifecycle_environment=dict(type='str', required=False),
@@ -741,12 +904,20 @@ def main():
             foreman_ssl=dict(type='bool', default=True),
             kickstart_repository_id=dict(type='str', default=None, required=False)
         ),
+        required_one_of=[['name', 'hosts']],
+        mutually_exclusive=[['name', 'hosts']],
     )
 
     if not foremanclient_found:
         module.fail_json(
             msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
 
+    if module.params['hosts']:
+        if module.params['state'] != 'rebooted':
+            module.fail_json(msg='hosts can only be used with state rebooted')
+        changed, hosts = rolling_reboot()
+        module.exit_json(changed=changed, hosts=hosts)
+
     changed, host = ensure()
     module.exit_json(changed=changed, host=host)
 
@@ -27,22 +27,34 @@ description:
 options:
   name:
     description: Image name as used in Foreman
+    required: false
+  compute_resource:
+    description: Name of the compute resource the image belongs to
     required: true
+  images:
+    description:
+    - List of images of the compute resource, each defined by name, uuid, operatingsystem, architecture and
+      optional user, password and state. Mutually exclusive with name.
+    - The images of the compute resource are listed once, changed images are written in parallel.
+    required: false
+  workers:
+    description: Number of parallel requests used by images
+    required: false
+    default: 4
   state:
     description: image state
     required: false
     default: 'present'
     choices: ['present', 'absent']
-  uuid:
   operatingsystem:
-    description: Operatingsystem used on the image
-    required: True
+    description: Operatingsystem used on the image, required if name is used with state present
+    required: False
   architecture:
-    description: Architecture the image is for
-    required: True
+    description: Architecture the image is for, required if name is used with state present
+    required: False
   uuid:
-    description: UUID of the image
-    required: True
+    description: UUID of the image, required if name is used with state present
+    required: False
   user:
     description: User used to log into the image
     required: False
@@ -83,6 +95,23 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure all images of a compute resource
+  foreman_image:
+    compute_resource: VMwareCluster01
+    images:
+    - name: Debian Stretch
+      architecture: x86_64
+      operatingsystem: Debian 9
+      uuid: templates/debian-9
+    - name: Debian Buster
+      architecture: x86_64
+      operatingsystem: Debian 10
+      uuid: templates/debian-10
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -92,6 +121,14 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
 
 def get_resources(resource_type, resource_func, resource_name, search_field='name'):
     if not resource_name:
@@ -110,13 +147,11 @@ def get_resources(resource_type, resource_func, resource_name, search_field='nam
     return resource
 
 
-def ensure():
-    name = module.params['name']
-    compute_resource_name = module.params['compute_resource']
-    state = module.params['state']
+def images_equal(data, image):
+    return all(data[key] == image.get(key, data[key]) for key in data.keys())
 
-    data = dict(name=name)
 
+def get_compute_resource(compute_resource_name):
     try:
         compute_resource = theforeman.search_compute_resource(data=dict(name=compute_resource_name))
     except ForemanError as e:
@@ -124,23 +159,102 @@ def ensure():
 
     if not compute_resource:
         module.fail_json(msg='Could not find compute resource {0}'.format(compute_resource_name))
+    return compute_resource
 
-    cid = compute_resource['id']
+
+def find_image(cid, name):
     try:
-        images = theforeman.get_compute_resource_images(compute_resource['id'])
-        for i in images:
-            if i['name'] == name:
-                image = i
-                break
-        else:
-            image = None
+        images = get_image_index(theforeman, cid).get(name, [])
     except ForemanError as e:
         module.fail_json(msg='Could not get images: {0}'.format(e.message))
+    if len(images) > 1:
+        module.fail_json(msg='Found {0} images named {1}'.format(len(images), name))
+    if images:
+        return images[0]
+    return None
+
+
+def sync_images():
+    workers = module.params['workers']
+    indexes = dict()
+
+    cid = get_compute_resource(module.params['compute_resource'])['id']
+
+    changes = []
+    results = []
+    for item in module.params['images']:
+        required = ['name'] if item.get('state', 'present') == 'absent' else ['name', 'architecture', 'operatingsystem']
+        missing = [key for key in required if not item.get(key)]
+        if missing:
+            module.fail_json(msg='Image {0} requires {1}'.format(item.get('name'), ', '.join(missing)))
+
+    for item in module.params['images']:
+        name = item.get('name')
+        image = find_image(cid, name)
+        result = dict(name=name, action='unchanged')
+        results.append(result)
+        if item.get('state', 'present') == 'absent':
+            if image:
+                result['action'] = 'deleted'
+                changes.append((result, image, None))
+            continue
+
+        data = dict(name=name, compute_resource_id=cid, uuid=item.get('uuid'), username=item.get('user', 'root'))
+        if item.get('password'):
+            data['password'] = item.get('password')
+        data['architecture_id'] = get_indexed_ids(module, theforeman, indexes, 'architectures',
+                                                  [item.get('architecture')])[0]
+        data['operatingsystem_id'] = get_indexed_ids(module, theforeman, indexes, 'operatingsystems',
+                                                     [item.get('operatingsystem')])[0]
+        if not image:
+            result['action'] = 'created'
+            changes.append((result, image, data))
+            continue
+        data['id'] = image['id']
+        if not images_equal(data, image):
+            result['action'] = 'updated'
+            changes.append((result, image, data))
+
+    def apply(change):
+        result, image, data = change
+        if result['action'] == 'deleted':
+            return theforeman.delete_compute_resource_image(cid, image.get('id'))
+        if result['action'] == 'created':
+            return theforeman.create_compute_resource_image(compute_resource_id=cid, data=data)
+        return theforeman.update_compute_resource_image(compute_resource_id=cid,
+                                                        data=dict(compute_resource_id=cid, id=image['id'],
+                                                                  image=data))
+
+    errors = []
+    for change, image, error in run_parallel(apply, changes, workers):
+        if error:
+            change[0]['action'] = 'failed'
+            errors.append('{0}: {1}'.format(change[0]['name'], error))
+    invalidate_image_index(cid)
+
+    changed = any(result['action'] not in ['unchanged', 'failed'] for result in results)
+    if errors:
+        module.fail_json(msg='Could not sync images: {0}'.format('; '.join(errors)), changed=changed, images=results)
+    return changed, results
+
+
+def ensure():
+    name = module.params['name']
+    compute_resource_name = module.params['compute_resource']
+    state = module.params['state']
+
+    data = dict(name=name)
+
+    compute_resource = get_compute_resource(compute_resource_name)
+
+    cid = compute_resource['id']
+    image = find_image(cid, name)
 
     if state == 'absent':
         if image:
             try:
                 image = theforeman.delete_compute_resource_image(cid, image.get('id'))
+                invalidate_image_index(cid)
                 return True, image
             except ForemanError as e:
                 module.fail_json(msg='Could not delete image: {0}'.format(e.message))
@@ -164,17 +278,19 @@ def ensure():
         try:
             image = theforeman.create_compute_resource_image(compute_resource_id=cid,
                                                              data=data)
+            invalidate_image_index(cid)
             return True, image
         except ForemanError as e:
             module.fail_json(msg='Could not create image: {0}'.format(e.message))
     else:
         data['id'] = image['id']
 
-    if not all(data[key] == image.get(key, data[key]) for key in data.keys()):
+    if not images_equal(data, image):
         try:
             new_data = dict(compute_resource_id=cid, id=image['id'], image=data)
             image = theforeman.update_compute_resource_image(compute_resource_id=cid,
                                                              data=new_data)
+            invalidate_image_index(cid)
             return True, image
         except ForemanError as e:
             module.fail_json(msg='Could not update image: {0}'.format(e.message))
@@ -188,11 +304,21 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
             compute_resource=dict(type='str', required=True),
-            architecture=dict(type='str', required=True),
-            operatingsystem=dict(operatingsystem='str', required=True),
-            uuid=dict(type='str', required=True),
+            images=dict(type='list', elements='dict', required=False, options=dict(
+                name=dict(type='str', required=True),
+                architecture=dict(type='str'),
+                operatingsystem=dict(type='str'),
+                uuid=dict(type='str'),
+                user=dict(type='str', default='root'),
+                password=dict(type='str', no_log=True),
+                state=dict(type='str', default='present', choices=['present', 'absent']),
+            )),
+            workers=dict(type='int', default=4),
+            architecture=dict(type='str', required=False),
+            operatingsystem=dict(type='str', required=False),
+            uuid=dict(type='str', required=False),
             user=dict(type='str', default='root'),
             password=dict(type='str', default=None, no_log=True),
             state=dict(type='str', default='present', choices=['present', 'absent']),
@@ -202,10 +328,18 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'images']],
+        mutually_exclusive=[['name', 'images']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+    if module.params['name'] and module.params['state'] == 'present':
+        missing = [key for key in ['architecture', 'operatingsystem', 'uuid'] if not module.params[key]]
+        if missing:
+            module.fail_json(msg='missing required arguments: {0}'.format(', '.join(missing)))
 
     foreman_host = module.params['foreman_host']
     foreman_port = module.params['foreman_port']
@@ -219,6 +353,10 @@ def main():
                          password=foreman_pass,
                          ssl=foreman_ssl)
 
+    if module.params['images']:
+        changed, images = sync_images()
+        module.exit_json(changed=changed, images=images)
+
     changed, image = ensure()
     module.exit_json(changed=changed, image=image)
 
@@ -142,19 +142,6 @@ except ImportError as e:
     import_error_msg = str(e)
 
 
-def get_user_ids(module, theforeman, users):
-    result = []
-    for i in range(0, len(users)):
-        try:
-            user = theforeman.search_user(data={'login': users[i]})
-            if not user:
-                module.fail_json('Could not find user {0}'.format(users[i]))
-            result.append(user.get('id'))
-        except ForemanError as e:
-            module.fail_json('Could not get user: {0}'.format(e.message))
-    return result
-
-
 def ldaps_equal(data, ldap, cmp_keys):
     for key in cmp_keys:
         if (key in data) and (data.get(key) != ldap.get(key)):
@@ -25,17 +25,45 @@ description:
 - Create, opdate and and delete Foreman Locations using Foreman API v2
 options:
   name:
-    description: Location name
-    required: True
+    description:
+    - Location name, nested locations can be given by title, e.g. Parent/Child.
+    - Mutually exclusive with tree.
+    required: False
   state:
     description: Location state
     required: False
     default: present
     choices: ["present", "absent"]
   users:
-    description: List of usernames assigned to the location
+    description:
+    - List of usernames assigned to the location, merged with the users of resources.
+    - The users of an existing location are updated as well, see append.
+    required: False
+    default: None
+  tree:
+    description:
+    - List of titles of nested locations, e.g. Europe/FRA1/Room1. Mutually exclusive with name.
+    - Missing locations and their parents are created level by level in parallel.
+    - Only state present is supported with tree.
+    required: False
+    default: None
+  workers:
+    description: Number of parallel requests used by tree
+    required: False
+    default: 4
+  resources:
+    description:
+    - Dict of resource type to the names of the resources associated with the location.
+    - Resources of types not listed are not changed.
+    - Supported types are compute_resources, config_templates, domains, environments, hostgroups, media, ptables,
+      realms, smart_proxies, subnets and users (by login).
+    - All resources of a type are resolved from one listing and set in a single update.
     required: False
     default: None
+  append:
+    description: Keep resources already associated with the location which are not listed in resources
+    required: False
+    default: False
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -72,6 +100,31 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Assign subnets and hostgroups to MY-DC
+  foreman_location:
+    name: MY-DC
+    resources:
+      subnets:
+      - prod-net-01
+      - prod-net-02
+      hostgroups:
+      - base/web
+    append: true
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Ensure a tree of locations
+  foreman_location:
+    tree:
+    - Europe/FRA1/Room1
+    - Europe/FRA1/Room2
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -81,24 +134,21 @@ except ImportError:
 else:
     foremanclient_found = True
 
+try:
+    from ansible.module_utils.foreman_utils import *
 
-def get_user_ids(module, theforeman, users):
-    result = []
-    for i in range(0, len(users)):
-        try:
-            user = theforeman.search_user(data={'login': users[i]})
-            if not user:
-                module.fail_json('Could not find user {0}'.format(users[i]))
-            result.append(user.get('id'))
-        except ForemanError as e:
-            module.fail_json('Could not get user: {0}'.format(e.message))
-    return result
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
 
 
 def ensure(module):
     name = module.params['name']
     state = module.params['state']
     users = module.params['users']
+    resources = module.params['resources']
+    append = module.params['append']
 
     foreman_host = module.params['foreman_host']
     foreman_port = module.params['foreman_port']
@@ -113,19 +163,37 @@ def ensure(module):
                          ssl=foreman_ssl)
 
     data = {'name': name}
+    search_data = data
+
+    parent_title, data['name'] = split_taxonomy_title(name)
+    if parent_title:
+        search_data = {'title': name}
 
     try:
-        location = theforeman.search_location(data=data)
+        location = theforeman.search_location(data=search_data)
     except ForemanError as e:
         module.fail_json(msg='Could not get location: {0}'.format(e.message))
 
-    if users:
-        data['user_ids'] = get_user_ids(module, theforeman, users)
+    resource_ids = dict()
+    if resources and state == 'present':
+        resource_ids = get_taxonomy_resource_ids(module, theforeman, resources)
+    if users and state == 'present':
+        user_ids = get_user_ids(module, theforeman, users)
+        resource_ids['user_ids'] = sorted(set(resource_ids.get('user_ids', [])) | set(user_ids))
 
     if not location and state == 'present':
+        data.update(resource_ids)
+        if parent_title:
+            try:
+                parent = theforeman.search_location(data={'title': parent_title})
+            except ForemanError as e:
+                module.fail_json(msg='Could not get parent location: {0}'.format(e.message))
+            if not parent:
+                module.fail_json(msg='Could not find parent location {0}'.format(parent_title))
+            data['parent_id'] = parent.get('id')
         try:
             theforeman.create_location(data=data)
-            return True
+            return True, None
         except ForemanError as e:
             module.fail_json(msg='Could not create location: {0}'.format(e.message))
 
@@ -133,32 +201,61 @@ def ensure(module):
         if state == 'absent':
             try:
                 theforeman.delete_location(id=location.get('id'))
-                return True
+                return True, None
             except ForemanError as e:
                 module.fail_json('Could not delete location: {0}'.format(e.message))
 
-    return False
+    if location and resource_ids:
+        try:
+            location = theforeman.get_location(id=location.get('id'))
+        except ForemanError as e:
+            module.fail_json(msg='Could not get location: {0}'.format(e.message))
+        data, changes = get_taxonomy_resource_changes(location, resource_ids, append)
+        if data:
+            try:
+                theforeman.update_location(id=location.get('id'), data=data)
+                return True, changes
+            except ForemanError as e:
+                module.fail_json(msg='Could not update location: {0}'.format(e.message))
+
+    return False, None
 
 
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             users=dict(type='list', required=False),
+            resources=dict(type='dict', required=False),
+            append=dict(type='bool', default=False),
+            tree=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'tree']],
+        mutually_exclusive=[['name', 'tree']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['tree']:
+        if module.params['state'] == 'absent':
+            module.fail_json(msg='state absent is not supported with tree')
+        theforeman = init_foreman_client(module)
+        changed, tree = sync_taxonomy_tree(module, theforeman, 'locations', theforeman.create_location,
+                                           module.params['tree'], module.params['workers'])
+        module.exit_json(changed=changed, tree=tree)
 
-    changed = ensure(module)
-    module.exit_json(changed=changed, name=module.params['name'])
+    changed, resources = ensure(module)
+    module.exit_json(changed=changed, name=module.params['name'], resources=resources)
 
 
 from ansible.module_utils.basic import *
@@ -49,6 +49,11 @@ options:
     description:
     - List of organization the medium should be assigned to
     required: false
+  workers:
+    description:
+    - Number of parallel delete requests used when deleting all media
+    required: false
+    default: 4
   foreman_host:
     description:
     - Hostname or IP address of Foreman system
@@ -153,12 +158,15 @@ def ensure(module):
 
     if name == '*' and state == 'absent':
         try:
-            all_media_list = theforeman.get_resources(resource_type=MEDIA)
-            for element in all_media_list:
-                theforeman.delete_medium(id=element.get('id'))
-            return True, all_media_list
+            all_media_list = get_all_resources(theforeman, MEDIA)
         except ForemanError as e:
             module.fail_json(msg='Error in deleting all existing media: {0}'.format(e.message))
+        errors = [error for medium, result, error in delete_resources(theforeman, MEDIA, all_media_list,
+                                                                       workers=module.params['workers'])
+                  if error]
+        if errors:
+            module.fail_json(msg='Error in deleting all existing media: {0}'.format('; '.join(errors)))
+        return len(all_media_list) > 0, all_media_list
 
     try:
         medium = theforeman.search_medium(data=data)
@@ -209,6 +217,7 @@ def main():
             organizations=dict(type='list', required=False),
             locations=dict(type='list', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
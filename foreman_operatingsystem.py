@@ -30,10 +30,21 @@ options:
     default: None
   name:
     description: OS name
-    required: true
+    required: false
   major:
     description: OS major version
-    required: true
+    required: false
+  operatingsystems:
+    description:
+    - List of operatingsystems defined by the same options as a single operatingsystem (name, major, minor,
+      description, family, release_name, architectures, media, ptables and state). Mutually exclusive with name.
+    - Architectures, media, partition tables and operatingsystems are listed once, changes are applied in parallel.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used by operatingsystems
+    required: false
+    default: 4
   minor:
     description: OS minor version
     required: false
@@ -93,6 +104,34 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure CentOS catalog
+  foreman_operatingsystem:
+    operatingsystems:
+    - name: CentOS
+      major: 7
+      minor: 7
+      family: Redhat
+      architectures:
+      - x86_64
+      media:
+      - CentOS mirror
+      ptables:
+      - Kickstart default
+    - name: CentOS
+      major: 8
+      minor: 1
+      family: Redhat
+      architectures:
+      - x86_64
+      media:
+      - CentOS mirror
+      ptables:
+      - Kickstart default
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -208,6 +247,89 @@ def ensure(module):
     return False, os
 
 
+def get_os_key(name, major, minor):
+    return name, str(major or ''), str(minor or '')
+
+
+def sync_operatingsystems(module):
+    comparable_keys = ['description', 'family', 'major', 'minor', 'release_name']
+    workers = module.params['workers']
+
+    theforeman = init_foreman_client(module)
+    indexes = dict()
+
+    try:
+        operatingsystems = dict((get_os_key(item.get('name'), item.get('major'), item.get('minor')), item)
+                                for item in get_all_resources(theforeman, 'operatingsystems'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get operatingsystems: {0}'.format(e.message))
+
+    def get_indexed(resource_type, specs):
+        names = [spec.get('name') if isinstance(spec, dict) else spec for spec in specs]
+        return get_indexed_resources(module, theforeman, indexes, resource_type, names)
+
+    entries = []
+    for item in module.params['operatingsystems']:
+        entry = dict(name=item.get('name'), major=item.get('major'), minor=item.get('minor'),
+                     state=item.get('state', 'present'))
+        entry['os'] = operatingsystems.get(get_os_key(item.get('name'), item.get('major'), item.get('minor')))
+        entries.append(entry)
+        if entry['state'] == 'absent':
+            entry['action'] = 'deleted' if entry['os'] else 'unchanged'
+            continue
+
+        data = dict(name=item.get('name'), major=item.get('major'), minor=item.get('minor'),
+                    description=item.get('description'), family=item.get('family'),
+                    release_name=item.get('release_name'))
+        data['architectures'] = get_indexed('architectures', item.get('architectures') or [])
+        entry['comparable_arrays'] = ['architectures']
+        if item.get('media'):
+            data['media'] = get_indexed('media', item.get('media'))
+            entry['comparable_arrays'].append('media')
+        if item.get('ptables'):
+            data['ptables'] = get_indexed('ptables', item.get('ptables'))
+            entry['comparable_arrays'].append('ptables')
+        entry['data'] = data
+
+        if not entry['os']:
+            entry['action'] = 'created'
+        elif not all(str(data.get(key) or '') == str(entry['os'].get(key) or '') for key in comparable_keys):
+            entry['action'] = 'updated'
+        else:
+            entry['action'] = 'unchanged'
+
+    # The listing has no associations, only operatingsystems which seem unchanged are fetched to compare them
+    unknown = [entry for entry in entries if entry['state'] == 'present' and entry['action'] == 'unchanged']
+    for entry, os, error in run_parallel(lambda item: theforeman.get_operatingsystem(id=item['os'].get('id')),
+                                         unknown, workers):
+        if error:
+            module.fail_json(msg='Could not get operatingsystem {0}: {1}'.format(entry['name'], error))
+        if not oses_equal(entry['data'], os, [], entry['comparable_arrays']):
+            entry['action'] = 'updated'
+
+    def apply(entry):
+        if entry['action'] == 'deleted':
+            return theforeman.delete_operatingsystem(id=entry['os'].get('id'))
+        if entry['action'] == 'updated':
+            return theforeman.update_operatingsystem(id=entry['os'].get('id'), data=entry['data'])
+        return theforeman.create_operatingsystem(data=entry['data'])
+
+    errors = []
+    for entry, os, error in run_parallel(apply, [entry for entry in entries if entry['action'] != 'unchanged'],
+                                         workers):
+        if error:
+            entry['action'] = 'failed'
+            errors.append('{0}: {1}'.format(entry['name'], error))
+
+    results = [dict(name=entry['name'], major=entry['major'], minor=entry['minor'], action=entry['action'])
+               for entry in entries]
+    changed = any(entry['action'] in ['created', 'updated', 'deleted'] for entry in entries)
+    if errors:
+        module.fail_json(msg='Could not sync operatingsystems: {0}'.format('; '.join(errors)),
+                         changed=changed, operatingsystems=results)
+    return changed, results
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
@@ -217,7 +339,9 @@ def main():
             major=dict(type='str', required=False),
             media=dict(type='list', required=False),
             minor=dict(type='str', required=False),
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            operatingsystems=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             ptables=dict(type='list', required=False),
             release_name=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
@@ -227,10 +351,18 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'operatingsystems']],
+        mutually_exclusive=[['name', 'operatingsystems']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['operatingsystems']:
+        changed, operatingsystems = sync_operatingsystems(module)
+        module.exit_json(changed=changed, operatingsystems=operatingsystems)
 
     changed, os = ensure(module)
     module.exit_json(changed=changed, operatingsystem=os)
@@ -24,13 +24,45 @@ description:
 - Create and delete Foreman organization resources using Foreman API v2
 options:
   name:
-    description: Organization name
-    required: true
+    description:
+    - Organization name, nested organizations can be given by title, e.g. Parent/Child.
+    - Mutually exclusive with tree.
+    required: false
   state:
     description: Organization state
     required: false
     default: present
     choices: ["present", "absent"]
+  users:
+    description:
+    - List of usernames assigned to the organization, merged with the users of resources.
+    - The users of an existing organization are updated as well, see append.
+    required: False
+    default: None
+  tree:
+    description:
+    - List of titles of nested organizations, e.g. Europe/FRA1/Room1. Mutually exclusive with name.
+    - Missing organizations and their parents are created level by level in parallel.
+    - Only state present is supported with tree.
+    required: False
+    default: None
+  workers:
+    description: Number of parallel requests used by tree
+    required: False
+    default: 4
+  resources:
+    description:
+    - Dict of resource type to the names of the resources associated with the organization.
+    - Resources of types not listed are not changed.
+    - Supported types are compute_resources, config_templates, domains, environments, hostgroups, media, ptables,
+      realms, smart_proxies, subnets and users (by login).
+    - All resources of a type are resolved from one listing and set in a single update.
+    required: False
+    default: None
+  append:
+    description: Keep resources already associated with the organization which are not listed in resources
+    required: False
+    default: False
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -55,6 +87,45 @@ version_added: "2.0"
 author: "Thomas Krahn (@nosmoht)"
 '''
 
+EXAMPLES = '''
+- name: Ensure Development organization
+  foreman_organization:
+    name: Development
+    state: present
+    users:
+    - pinky
+    - brain
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Assign subnets and hostgroups to Development
+  foreman_organization:
+    name: Development
+    resources:
+      subnets:
+      - prod-net-01
+      - prod-net-02
+      hostgroups:
+      - base/web
+    append: true
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Ensure a tree of organizations
+  foreman_organization:
+    tree:
+    - ACME/Engineering/Room1
+    - ACME/Engineering/Room2
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+'''
+
 try:
     from foreman.foreman import *
 except ImportError:
@@ -62,10 +133,21 @@ except ImportError:
 else:
     foremanclient_found = True
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
 
 def ensure(module):
     name = module.params['name']
     state = module.params['state']
+    users = module.params['users']
+    resources = module.params['resources']
+    append = module.params['append']
 
     foreman_host = module.params['foreman_host']
     foreman_port = module.params['foreman_port']
@@ -80,47 +162,98 @@ def ensure(module):
                          ssl=foreman_ssl)
 
     data = {'name': name}
+    search_data = data
+
+    parent_title, data['name'] = split_taxonomy_title(name)
+    if parent_title:
+        search_data = {'title': name}
 
     try:
-        organization = theforeman.search_organization(data=data)
+        organization = theforeman.search_organization(data=search_data)
     except ForemanError as e:
         module.fail_json(msg='Could not get organization: {0}'.format(e.message))
 
+    resource_ids = dict()
+    if resources and state == 'present':
+        resource_ids = get_taxonomy_resource_ids(module, theforeman, resources)
+    if users and state == 'present':
+        user_ids = get_user_ids(module, theforeman, users)
+        resource_ids['user_ids'] = sorted(set(resource_ids.get('user_ids', [])) | set(user_ids))
+
     if not organization and state == 'present':
+        data.update(resource_ids)
+        if parent_title:
+            try:
+                parent = theforeman.search_organization(data={'title': parent_title})
+            except ForemanError as e:
+                module.fail_json(msg='Could not get parent organization: {0}'.format(e.message))
+            if not parent:
+                module.fail_json(msg='Could not find parent organization {0}'.format(parent_title))
+            data['parent_id'] = parent.get('id')
         try:
             theforeman.create_organization(data=data)
-            return True
+            return True, None
         except ForemanError as e:
             module.fail_json(msg='Could not create organization: {0}'.format(e.message))
 
     if organization and state == 'absent':
         try:
             theforeman.delete_organization(id=organization.get('id'))
-            return True
+            return True, None
         except ForemanError as e:
             module.fail_json('Could not delete organization: {0}'.format(e.message))
 
-    return False
+    if organization and resource_ids:
+        try:
+            organization = theforeman.get_organization(id=organization.get('id'))
+        except ForemanError as e:
+            module.fail_json(msg='Could not get organization: {0}'.format(e.message))
+        data, changes = get_taxonomy_resource_changes(organization, resource_ids, append)
+        if data:
+            try:
+                theforeman.update_organization(id=organization.get('id'), data=data)
+                return True, changes
+            except ForemanError as e:
+                module.fail_json(msg='Could not update organization: {0}'.format(e.message))
+
+    return False, None
 
 
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
+            users=dict(type='list', required=False),
+            resources=dict(type='dict', required=False),
+            append=dict(type='bool', default=False),
+            tree=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'tree']],
+        mutually_exclusive=[['name', 'tree']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['tree']:
+        if module.params['state'] == 'absent':
+            module.fail_json(msg='state absent is not supported with tree')
+        theforeman = init_foreman_client(module)
+        changed, tree = sync_taxonomy_tree(module, theforeman, 'organizations', theforeman.create_organization,
+                                           module.params['tree'], module.params['workers'])
+        module.exit_json(changed=changed, tree=tree)
 
-    changed = ensure(module)
-    module.exit_json(changed=changed, name=module.params['name'])
+    changed, resources = ensure(module)
+    module.exit_json(changed=changed, name=module.params['name'], resources=resources)
 
 
 from ansible.module_utils.basic import *
@@ -25,13 +25,25 @@ description:
 options:
   operatingsystem:
     description: Operatingsystem name
-    required: true
+    required: false
   config_template:
     description: Config Template name
-    required: true
+    required: false
   template_kind:
     description: Template kind
-    required: true
+    required: false
+  default_templates:
+    description:
+    - List of default templates to set at once, each defined by operatingsystem, config_template, template_kind
+      and an optional state. Mutually exclusive with operatingsystem, config_template and template_kind.
+    - Config templates and operatingsystems are listed only once.
+    - An operatingsystem has only one default template per kind, so an existing default template of the same kind
+      is replaced. The same applies to a single default template.
+    required: false
+  workers:
+    description: Number of parallel requests used by default_templates
+    required: false
+    default: 4
   state:
     description: OS Default template state
     required: false
@@ -72,6 +84,23 @@ EXAMPLES = '''
     foreman_pass: secret
     foreman_host: foreman.example.com
     foreman_port: 443
+
+- name: Ensure OS Default Templates of all operatingsystems
+  foreman_os_default_template:
+    default_templates:
+    - operatingsystem: CentOS 7
+      config_template: Kickstart default
+      template_kind: provision
+    - operatingsystem: CentOS 7
+      config_template: Kickstart default PXELinux
+      template_kind: PXELinux
+    - operatingsystem: CentOS 8
+      config_template: Kickstart default
+      template_kind: provision
+    foreman_user: admin
+    foreman_pass: secret
+    foreman_host: foreman.example.com
+    foreman_port: 443
 '''
 
 try:
@@ -81,6 +110,26 @@ except ImportError:
 else:
     foremanclient_found = True
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def search_config_template(name, template_kind_name):
+    search = 'name = "{name}" and kind = "{kind}"'.format(name=name, kind=template_kind_name)
+    try:
+        config_templates = get_all_resources(theforeman, 'config_templates', search=search)
+    except ForemanError as e:
+        module.fail_json(msg='Could not search config template: {0}'.format(e.message))
+    for item in config_templates:
+        if item.get('name') == name and item.get('template_kind_name') == template_kind_name:
+            return item
+    return None
+
 
 def ensure():
     os_name = module.params['operatingsystem']
@@ -96,35 +145,26 @@ def ensure():
     if not os:
         module.fail_json(msg='Operatingsystem {os_name} not found'.format(os_name=os_name))
 
-    try:
-        config_templates = theforeman.get_config_templates()
-    except:
-        module.fail_json(msg='Could not get config templates: {0}'.format(e.message))
-
-    config_template = None
-    for item in config_templates:
-        if item.get('name') == config_template_name and item.get('template_kind_name') == template_kind_name:
-            config_template = item
-            break
-
+    config_template = search_config_template(config_template_name, template_kind_name)
     if not config_template:
         module.fail_json(msg='Could not find config template {config_template} of kind {template_kind}'.format(
-            config_template_name=config_template_name, template_kind=template_kind_name))
+            config_template=config_template_name, template_kind=template_kind_name))
 
     try:
         os_default_templates = theforeman.get_operatingsystem_default_templates(id=os.get('id'))
     except ForemanError as e:
         module.fail_json(msg='Could not get operatingsystem default templates: {0}'.format(e.message))
 
+    # An operatingsystem has only one default template per kind, the same as with default_templates
     os_default_template = None
     for item in os_default_templates:
-        if (item.get('config_template_id') == config_template.get('id')) and (
-                    item.get('template_kind_id') == config_template.get('template_kind_id')):
+        if item.get('template_kind_id') == config_template.get('template_kind_id'):
             os_default_template = item
             break
+    assigned = os_default_template and os_default_template.get('config_template_id') == config_template.get('id')
 
     if state == 'absent':
-        if os_default_template:
+        if assigned:
             try:
                 os_default_template = theforeman.delete_operatingsystem_default_template(id=os.get('id'),
                                                                                          template_id=os_default_template.get(
@@ -132,12 +172,22 @@ def ensure():
             except:
                 module.fail_json(msg='Could not delete operatingsystem default template: {0}'.format(e.message))
             return True, os_default_template
-        return False, os_default_template
+        return False, None
+
+    data = dict(config_template_id=config_template.get('id'), template_kind_id=config_template.get('template_kind_id'))
+    if os_default_template and not assigned:
+        try:
+            os_default_template = theforeman.update_resource(resource_type='operatingsystems',
+                                                             resource_id=os.get('id'), data=data,
+                                                             component='os_default_templates',
+                                                             component_id=os_default_template.get('id'))
+        except ForemanError as e:
+            module.fail_json(msg='Could not update operatingsystem default template: {0}'.format(e.message))
+        return True, os_default_template
 
     if not os_default_template:
         try:
-            os_default_template = theforeman.create_operatingsystem_default_template(id=os.get('id'), data=dict(
-                config_template_id=config_template.get('id'), template_kind_id=config_template.get('template_kind_id')))
+            os_default_template = theforeman.create_operatingsystem_default_template(id=os.get('id'), data=data)
         except ForemanError as e:
             module.fail_json(msg='Could not create operatingsystem default template: {0}'.format(e.message))
         return True, os_default_template
@@ -145,15 +195,91 @@ def ensure():
     return False, os_default_template
 
 
+def sync_default_templates():
+    workers = module.params['workers']
+    indexes = dict()
+
+    try:
+        config_templates = dict(((item.get('name'), item.get('template_kind_name')), item)
+                                for item in get_all_resources(theforeman, 'config_templates'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get config templates: {0}'.format(e.message))
+
+    os_names = []
+    operatingsystems = dict()
+    defined = dict()
+    for item in module.params['default_templates']:
+        os_name = item.get('operatingsystem')
+        key = (item.get('config_template'), item.get('template_kind'))
+        if key not in config_templates:
+            module.fail_json(msg='Could not find config template {config_template} of kind {template_kind}'.format(
+                config_template=key[0], template_kind=key[1]))
+        if os_name not in defined:
+            operatingsystems[os_name] = get_indexed_resources(module, theforeman, indexes, 'operatingsystems',
+                                                              [os_name])[0]
+            os_names.append(os_name)
+            defined[os_name] = []
+        defined[os_name].append((config_templates[key], item.get('state', 'present')))
+
+    def get_default_templates(os_name):
+        return theforeman.get_operatingsystem_default_templates(id=operatingsystems[os_name].get('id'))
+
+    changes = []
+    for os_name, os_default_templates, error in run_parallel(get_default_templates, os_names, workers):
+        if error:
+            module.fail_json(msg='Could not get operatingsystem default templates of {0}: {1}'.format(os_name, error))
+        by_kind = dict((item.get('template_kind_id'), item) for item in os_default_templates)
+        for config_template, state in defined[os_name]:
+            current = by_kind.get(config_template.get('template_kind_id'))
+            assigned = current and current.get('config_template_id') == config_template.get('id')
+            if state == 'absent' and assigned:
+                changes.append(dict(os_name=os_name, action='deleted', config_template=config_template,
+                                    os_default_template=current))
+            elif state == 'present' and not assigned:
+                changes.append(dict(os_name=os_name, action='updated' if current else 'created',
+                                    config_template=config_template, os_default_template=current))
+
+    def apply(change):
+        os_id = operatingsystems[change['os_name']].get('id')
+        config_template = change['config_template']
+        data = dict(config_template_id=config_template.get('id'),
+                    template_kind_id=config_template.get('template_kind_id'))
+        if change['action'] == 'deleted':
+            return theforeman.delete_operatingsystem_default_template(
+                id=os_id, template_id=change['os_default_template'].get('id'))
+        if change['action'] == 'updated':
+            return theforeman.update_resource(resource_type='operatingsystems', resource_id=os_id, data=data,
+                                              component='os_default_templates',
+                                              component_id=change['os_default_template'].get('id'))
+        return theforeman.create_operatingsystem_default_template(id=os_id, data=data)
+
+    results = []
+    errors = []
+    for change, os_default_template, error in run_parallel(apply, changes, workers):
+        result = dict(operatingsystem=change['os_name'], config_template=change['config_template'].get('name'),
+                      template_kind=change['config_template'].get('template_kind_name'), action=change['action'])
+        if error:
+            result['action'] = 'failed'
+            errors.append('{0} {1}: {2}'.format(change['os_name'], result['config_template'], error))
+        results.append(result)
+
+    if errors:
+        module.fail_json(msg='Could not set operatingsystem default templates: {0}'.format('; '.join(errors)),
+                         changed=len(errors) < len(changes), os_default_templates=results)
+    return len(changes) > 0, results
+
+
 def main():
     global module
     global theforeman
 
     module = AnsibleModule(
         argument_spec=dict(
-            operatingsystem=dict(type='str', required=True),
-            config_template=dict(type='str', required=True),
-            template_kind=dict(type='str', required=True),
+            operatingsystem=dict(type='str', required=False),
+            config_template=dict(type='str', required=False),
+            template_kind=dict(type='str', required=False),
+            default_templates=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
@@ -161,10 +287,15 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['operatingsystem', 'default_templates']],
+        required_together=[['operatingsystem', 'config_template', 'template_kind']],
+        mutually_exclusive=[['operatingsystem', 'default_templates']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
 
     foreman_host = module.params['foreman_host']
     foreman_port = module.params['foreman_port']
@@ -178,6 +309,10 @@ def main():
                          password=foreman_pass,
                          ssl=foreman_ssl)
 
+    if module.params['default_templates']:
+        changed, os_default_templates = sync_default_templates()
+        module.exit_json(changed=changed, os_default_templates=os_default_templates)
+
     changed, os_default_template = ensure()
     module.exit_json(changed=changed, os_default_template=os_default_template)
 
@@ -26,7 +26,26 @@ options:
   name:
     description:
     - Partition Table name
-    required: true
+    - Either name or directory is required.
+    required: false
+  directory:
+    description:
+    - Directory to sync all partition tables from. Every file is a partition table which can start with a
+      Foreman metadata header (name, os_family, oses, organizations, locations), missing values are taken from
+      the other module options and the name defaults to the file name.
+    - Changed partition tables are uploaded in parallel, templates with another model in their metadata are skipped.
+    - Only state present is supported with directory.
+    required: false
+  workers:
+    description:
+    - Number of parallel requests used by directory
+    required: false
+    default: 4
+  cache_dir:
+    description:
+    - Directory to cache digests of partition tables synced by directory in. Partition tables which were not
+      modified in Foreman since they were synced are not fetched again to be compared.
+    required: false
   layout:
     description:
     - Partition Table layout
@@ -92,6 +111,15 @@ EXAMPLES = '''
     foreman_pass: secret
     foreman_host: foreman.example.com
     foreman_port: 443
+
+- name: Sync all partition tables from a directory
+  foreman_ptable:
+    directory: /srv/foreman/templates/ptables
+    cache_dir: ~/.cache/foreman
+    foreman_user: admin
+    foreman_pass: secret
+    foreman_host: foreman.example.com
+    foreman_port: 443
 '''
 
 try:
@@ -122,6 +150,84 @@ def ptables_equal(data, ptable):
         return False
     return True
 
+def get_ptable_digest(data):
+    digest_data = dict(data)
+    digest_data['layout'] = content_digest(digest_data['layout'])
+    return data_digest(digest_data)
+
+
+def get_directory_ptable_data(theforeman, indexes, entry):
+    metadata = entry['metadata']
+    data = dict(name=entry['name'], layout=entry['content'])
+
+    os_family = metadata.get('os_family', module.params['os_family'])
+    if os_family:
+        data['os_family'] = os_family
+    organizations = metadata.get('organizations', module.params['organizations'])
+    if organizations is not None:
+        data['organization_ids'] = get_indexed_ids(module, theforeman, indexes, 'organizations', organizations)
+    locations = metadata.get('locations', module.params['locations'])
+    if locations is not None:
+        data['location_ids'] = get_indexed_ids(module, theforeman, indexes, 'locations', locations)
+    operating_systems = metadata.get('oses', module.params['operating_systems'])
+    if operating_systems is not None:
+        # Like the template metadata of Foreman, an operatingsystem name matches all its versions
+        data['operatingsystem_ids'] = get_indexed_ids(module, theforeman, indexes, 'operatingsystems',
+                                                      operating_systems, all_matches=True)
+    return data
+
+
+def sync_directory():
+    workers = module.params['workers']
+
+    theforeman = init_foreman_client(module)
+    cache = load_cache(module, 'ptables')
+    indexes = dict()
+
+    entries = read_template_directory(module, module.params['directory'], 'Ptable')
+    ptables = get_resource_index(module, theforeman, indexes, 'ptables', keys=('name',))
+
+    for entry in entries:
+        entry['data'] = get_directory_ptable_data(theforeman, indexes, entry)
+        entry['digest'] = get_ptable_digest(entry['data'])
+        entry['ptable'] = ptables.get(entry['name'])
+        entry['action'] = 'unchanged' if entry['ptable'] else 'created'
+
+    # Partition tables whose digest is not known to be applied have to be compared to their layout in Foreman
+    unknown = [entry for entry in entries if entry['ptable'] and
+               not digest_unchanged(cache, 'ptables', entry['ptable'], entry['digest'])]
+    for entry, ptable, error in run_parallel(
+            lambda item: theforeman.get_partition_table(id=item['ptable'].get('id')), unknown, workers):
+        if error:
+            module.fail_json(msg='Could not get partition table {0}: {1}'.format(entry['name'], error))
+        if ptables_equal(entry['data'], ptable):
+            remember_digest(cache, 'ptables', ptable, entry['digest'])
+        else:
+            entry['action'] = 'updated'
+
+    def apply(entry):
+        if entry['ptable']:
+            return theforeman.update_partition_table(id=entry['ptable'].get('id'), data=entry['data'])
+        return theforeman.create_partition_table(entry['data'])
+
+    errors = []
+    for entry, ptable, error in run_parallel(apply, [item for item in entries
+                                                     if item['action'] != 'unchanged'], workers):
+        if error:
+            entry['action'] = 'failed'
+            errors.append('{0}: {1}'.format(entry['name'], error))
+        else:
+            remember_digest(cache, 'ptables', ptable, entry['digest'])
+    save_cache(module, 'ptables', cache)
+
+    results = [dict(name=entry['name'], path=entry['path'], action=entry['action']) for entry in entries]
+    changed = any(entry['action'] in ['created', 'updated'] for entry in entries)
+    if errors:
+        module.fail_json(msg='Could not sync partition tables: {0}'.format('; '.join(errors)),
+                         changed=changed, ptables=results)
+    return changed, results
+
+
 def ensure():
     name = module.params['name']
     layout = module.params['layout']
@@ -186,7 +292,10 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            directory=dict(type='path', required=False),
+            workers=dict(type='int', default=4),
+            cache_dir=dict(type='path', required=False),
             layout=dict(type='str', required=False),
             os_family=dict(type='str', required=False),
             operating_systems=dict(type='list', required=False),
@@ -199,6 +308,8 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'directory']],
+        mutually_exclusive=[['name', 'directory'], ['layout', 'directory']],
     )
 
     if not foremanclient_found:
@@ -206,6 +317,12 @@ def main():
     if has_import_error:
         module.fail_json(msg=import_error_msg)
 
+    if module.params['directory']:
+        if module.params['state'] == 'absent':
+            module.fail_json(msg='state absent is not supported with directory')
+        changed, ptables = sync_directory()
+        module.exit_json(changed=changed, ptables=ptables)
+
     changed, ptable = ensure()
     module.exit_json(changed=changed, ptable=ptable)
 
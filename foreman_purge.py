@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Ansible module to purge Foreman resources.
+#
+# This module is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = '''
+---
+module: foreman_purge
+short_description: Delete Foreman resources in bulk using Foreman API v2
+description:
+- Delete all resources of a type, optionally limited by a scoped search, using Foreman API v2
+options:
+  resource_type:
+    description: Type of the resources to delete
+    required: true
+    choices: ['media', 'ptables', 'config_templates', 'hosts', 'subnets']
+  search:
+    description:
+    - Scoped search to limit the resources to delete, e.g. 'name ~ lab-'. If not set all resources are deleted.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel delete requests
+    required: false
+    default: 4
+  retries:
+    description: Number of retries of a delete request failing with a server error (5xx)
+    required: false
+    default: 3
+  foreman_host:
+    description: Hostname or IP address of Foreman system
+    required: false
+    default: 127.0.0.1
+  foreman_port:
+    description: Port of Foreman API
+    required: false
+    default: 443
+  foreman_user:
+    description: Username to be used to authenticate on Foreman
+    required: true
+  foreman_pass:
+    description: Password to be used to authenticate user on Foreman
+    required: true
+  foreman_ssl:
+    description: Enable SSL when connecting to Foreman API
+    required: false
+    default: true
+notes:
+- Requires the python-foreman package to be installed. See https://github.com/Nosmoht/python-foreman.
+version_added: "2.0"
+author: "Thomas Krahn (@nosmoht)"
+'''
+
+EXAMPLES = '''
+- name: Delete all lab hosts
+  foreman_purge:
+    resource_type: hosts
+    search: name ~ lab-
+    workers: 8
+    foreman_host: foreman.example.com
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Delete all media
+  foreman_purge:
+    resource_type: media
+    ...
+'''
+
+try:
+    from foreman.foreman import *
+
+    foremanclient_found = True
+except ImportError:
+    foremanclient_found = False
+
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def purge_resources(module, theforeman, resource_type, resources):
+    deleted = []
+    failed = []
+    for resource, result, error in delete_resources(theforeman, resource_type, resources,
+                                                    workers=module.params['workers'],
+                                                    retries=module.params['retries']):
+        if error:
+            failed.append(dict(name=resource.get('name'), error=error))
+        else:
+            deleted.append(resource.get('name'))
+    return deleted, failed
+
+
+def ensure(module):
+    resource_type = module.params['resource_type']
+    search = module.params['search']
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        resources = get_all_resources(theforeman, resource_type, search=search)
+    except ForemanError as e:
+        module.fail_json(msg='Could not get {0}: {1}'.format(resource_type, e.message))
+
+    if module.check_mode:
+        return len(resources) > 0, [resource.get('name') for resource in resources], []
+
+    deleted, failed = purge_resources(module, theforeman, resource_type, resources)
+    if failed:
+        module.fail_json(msg='Could not delete {0} of {1} {2}'.format(len(failed), len(resources), resource_type),
+                         changed=len(deleted) > 0, deleted=deleted, failed=failed)
+    return len(deleted) > 0, deleted, failed
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            resource_type=dict(type='str', required=True,
+                               choices=['media', 'ptables', 'config_templates', 'hosts', 'subnets']),
+            search=dict(type='str', required=False),
+            workers=dict(type='int', default=4),
+            retries=dict(type='int', default=3),
+            foreman_host=dict(type='str', default='127.0.0.1'),
+            foreman_port=dict(type='str', default='443'),
+            foreman_user=dict(type='str', required=True),
+            foreman_pass=dict(type='str', required=True, no_log=True),
+            foreman_ssl=dict(type='bool', default=True)
+        ),
+        supports_check_mode=True,
+    )
+
+    if not foremanclient_found:
+        module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    changed, deleted, failed = ensure(module)
+    module.exit_json(changed=changed, deleted=deleted, failed=failed)
+
+
+from ansible.module_utils.basic import *
+
+if __name__ == '__main__':
+    main()
@@ -24,14 +24,33 @@ description:
 - Create, update and delete Foreman Realms using Foreman API v2
 options:
   name:
-    description: Realm name
-    required: true
+    description: Realm name. Mutually exclusive with realms.
+    required: false
   realm_proxy:
-    description: Realm smart proxy to use
-    required: true
+    description: Realm smart proxy to use. Required with name.
+    required: false
   realm_type:
-    description: Realm type (e.g FreeIPA)
-    required: true
+    description: Realm type (e.g FreeIPA). Required with name.
+    required: false
+  locations:
+    description: List of locations the realm should be assigned to
+    required: false
+    default: None
+  organizations:
+    description: List of organizations the realm should be assigned to
+    required: false
+    default: None
+  realms:
+    description:
+    - List of realms, each defined by name, realm_proxy, realm_type and optional locations, organizations and state.
+    - Mutually exclusive with name. All realms are listed once, smart proxies, organizations and locations are
+      resolved once for all realms and changes are applied in parallel.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used by realms
+    required: false
+    default: 4
   state:
     description: Realm state
     required: false
@@ -72,6 +91,24 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure Realms of all datacenters
+  foreman_realm:
+    realms:
+    - name: DC1.EXAMPLE.COM
+      realm_proxy: ipa-proxy01.example.com
+      realm_type: FreeIPA
+      locations:
+      - DC1
+    - name: DC2.EXAMPLE.COM
+      realm_proxy: ipa-proxy01.example.com
+      realm_type: FreeIPA
+      locations:
+      - DC2
+    foreman_host: foreman.example.com
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -81,6 +118,25 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def realms_equal(data, realm):
+    comparable_keys = set(data.keys()).intersection(set(['name', 'realm_type', 'realm_proxy_id']))
+    if not all(data.get(key, None) == realm.get(key, None) for key in comparable_keys):
+        return False
+    if not organizations_equal(data, realm):
+        return False
+    if not locations_equal(data, realm):
+        return False
+    return True
+
 
 def get_resources(resource_type, resource_specs):
     result = []
@@ -105,6 +161,62 @@ def get_resources(resource_type, resource_specs):
     return result
 
 
+def sync_realms(module):
+    workers = module.params['workers']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        realms = index_resources(get_all_resources(theforeman, 'realms'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get realms: {0}'.format(e.message))
+
+    defined = []
+    for item in module.params['realms']:
+        state = item.get('state', 'present')
+        data = {'name': item.get('name')}
+        if state == 'present':
+            if not item.get('realm_proxy') or not item.get('realm_type'):
+                module.fail_json(msg='Realm {0} requires realm_proxy and realm_type'.format(item.get('name')))
+            data['realm_type'] = item.get('realm_type')
+            data['realm_proxy_id'] = get_indexed_ids(module, theforeman, indexes, 'smart_proxies',
+                                                     [item.get('realm_proxy')])[0]
+            if item.get('organizations'):
+                data['organization_ids'] = get_indexed_ids(module, theforeman, indexes, 'organizations',
+                                                           item.get('organizations'))
+            if item.get('locations'):
+                data['location_ids'] = get_indexed_ids(module, theforeman, indexes, 'locations',
+                                                       item.get('locations'))
+        defined.append(dict(name=item.get('name'), state=state, data=data))
+
+    # Organizations and locations are not part of the realm listing
+    existing = [realms[item['name']] for item in defined
+                if item['state'] == 'present' and item['name'] in realms and
+                ('organization_ids' in item['data'] or 'location_ids' in item['data'])]
+    for found, realm, error in run_parallel(lambda found: theforeman.get_realm(id=found.get('id')), existing, workers):
+        if error:
+            module.fail_json(msg='Could not get realm {0}: {1}'.format(found.get('name'), error))
+        realms[found.get('name')] = realm
+
+    changes = []
+    for item in defined:
+        realm = realms.get(item['name'])
+        action = get_sync_action(item['state'], realm, lambda realm: realms_equal(item['data'], realm))
+        changes.append(dict(name=item['name'], action=action, data=item['data'], realm=realm,
+                            result=dict(name=item['name'], action=action)))
+
+    changed, results, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_realm(data=change['data']),
+        update=lambda change: theforeman.update_realm(id=change['realm'].get('id'), data=change['data']),
+        delete=lambda change: theforeman.delete_realm(id=change['realm'].get('id')),
+        workers=workers)
+    if errors:
+        module.fail_json(msg='Could not sync realms: {0}'.format('; '.join(errors)), changed=changed, realms=results)
+    return changed, results
+
+
 def ensure(module):
     global theforeman
 
@@ -112,6 +224,8 @@ def ensure(module):
     realm_proxy = module.params['realm_proxy']
     realm_type = module.params['realm_type']
     state = module.params['state']
+    organizations = module.params['organizations']
+    locations = module.params['locations']
 
     foreman_host = module.params['foreman_host']
     foreman_port = module.params['foreman_port']
@@ -133,6 +247,11 @@ def ensure(module):
 
     data['realm_type'] = realm_type
     data['realm_proxy_id'] = get_resources(resource_type='smart_proxies', resource_specs=[realm_proxy])[0].get('id')
+    if organizations:
+        data['organization_ids'] = get_organization_ids(module, theforeman, organizations)
+    if locations:
+        data['location_ids'] = get_location_ids(module, theforeman, locations)
+
     if not realm and state == 'present':
         try:
             realm = theforeman.create_realm(data=data)
@@ -148,7 +267,13 @@ def ensure(module):
             except ForemanError as e:
                 module.fail_json(msg='Could not delete realm: {0}'.format(e.message))
 
-        elif not all(data[key] == realm[key] for key in data):
+        if organizations or locations:
+            try:
+                realm = theforeman.get_realm(id=realm.get('id'))
+            except ForemanError as e:
+                module.fail_json(msg='Could not get realm: {0}'.format(e.message))
+
+        if not realms_equal(data, realm):
             try:
                 realm = theforeman.update_realm(id=realm.get('id'), data=data)
                 return True, realm
@@ -163,9 +288,13 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
-            realm_proxy=dict(type='str', required=True),
-            realm_type=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            realm_proxy=dict(type='str', required=False),
+            realm_type=dict(type='str', required=False),
+            organizations=dict(type='list', required=False),
+            locations=dict(type='list', required=False),
+            realms=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
@@ -173,10 +302,22 @@ def main():
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'realms']],
+        mutually_exclusive=[['name', 'realms']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['realms']:
+        changed, realms = sync_realms(module)
+        module.exit_json(changed=changed, realms=realms)
+
+    missing = [key for key in ['realm_proxy', 'realm_type'] if not module.params[key]]
+    if missing:
+        module.fail_json(msg='missing required arguments: {0}'.format(', '.join(missing)))
 
     changed, realm = ensure(module)
     module.exit_json(changed=changed, realm=realm)
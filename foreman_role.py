@@ -32,6 +32,21 @@ options:
     required: false
     default: 'present'
     choices: ['present', 'absent']
+  filters:
+    description:
+    - Complete list of filters of the role, each defined by resource_type, permissions and an optional search.
+    - Filters of the role which are not defined are deleted, filters are matched by resource_type and search.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used to sync filters
+    required: false
+    default: 4
+  cache_dir:
+    description:
+    - Directory to cache the permission catalog in. The catalog is fetched again once the Foreman version changes.
+    required: false
+    default: None
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -65,6 +80,24 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure Role with its filters
+  foreman_role:
+    name: Host Power
+    filters:
+    - resource_type: Host
+      permissions:
+      - view_hosts
+      - power_hosts
+    - resource_type: Hostgroup
+      permissions:
+      - view_hostgroups
+      search: name ~ prod
+    state: present
+    foreman_host: foreman.example.com
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -74,6 +107,76 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def get_filter_key(resource_type, search):
+    return resource_type, search or None
+
+
+def sync_filters(module, theforeman, role):
+    workers = module.params['workers']
+    permission_index = get_permission_index(module, theforeman)
+
+    defined = dict()
+    for item in module.params['filters']:
+        resource_type = item.get('resource_type')
+        missing = [name for name in item.get('permissions') or [] if (resource_type, name) not in permission_index]
+        if missing:
+            module.fail_json(msg='Could not find Permission {0} for {1}'.format(', '.join(missing), resource_type))
+        permission_ids = [permission_index[(resource_type, name)] for name in item.get('permissions') or []]
+        data = dict(role_id=role.get('id'), permission_ids=sorted(permission_ids))
+        if item.get('search'):
+            data['search'] = item.get('search')
+        defined[get_filter_key(resource_type, item.get('search'))] = data
+
+    try:
+        filters = get_all_resources(theforeman, 'filters', search='role_id = {0}'.format(role.get('id')))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get filters of role {0}: {1}'.format(role.get('name'), e.message))
+
+    changes = []
+    existing = dict()
+    for f in filters:
+        key = get_filter_key(f.get('resource_type'), f.get('search'))
+        if key not in defined or key in existing:
+            changes.append(dict(key=key, action='deleted', filter=f))
+            continue
+        existing[key] = f
+        if sorted(p['id'] for p in f.get('permissions') or []) != defined[key]['permission_ids']:
+            changes.append(dict(key=key, action='updated', filter=f, data=defined[key]))
+    for key, data in defined.items():
+        if key not in existing:
+            changes.append(dict(key=key, action='created', data=data))
+
+    def apply(change):
+        if change['action'] == 'deleted':
+            return theforeman.delete_filter(id=change['filter'].get('id'))
+        if change['action'] == 'updated':
+            return theforeman.update_resource(resource_type='filters', resource_id=change['filter'].get('id'),
+                                              data=change['data'])
+        return theforeman.create_filter(data=change['data'])
+
+    results = []
+    errors = []
+    for change, f, error in run_parallel(apply, changes, workers):
+        result = dict(resource_type=change['key'][0], search=change['key'][1], action=change['action'])
+        if error:
+            result.update(action='failed', error=error)
+            errors.append('{0}: {1}'.format(change['key'][0], error))
+        results.append(result)
+
+    if errors:
+        module.fail_json(msg='Could not sync filters of role {0}: {1}'.format(role.get('name'), '; '.join(errors)),
+                         changed=len(errors) < len(changes), role=role, filters=results)
+    return len(changes) > 0, results
+
 
 def ensure(module):
     name = module.params['name']
@@ -98,10 +201,12 @@ def ensure(module):
     except ForemanError as e:
         module.fail_json(msg='Could not get role: {0}'.format(e.message))
 
+    changed = False
+
     if not role and state == 'present':
         try:
             role = theforeman.create_role(data=data)
-            return True, role
+            changed = True
         except ForemanError as e:
             module.fail_json(msg='Could not create role: {0}'.format(e.message))
 
@@ -109,11 +214,16 @@ def ensure(module):
         if state == 'absent':
             try:
                 role = theforeman.delete_role(id=role.get('id'))
-                return True, role
+                return True, role, None
             except ForemanError as e:
                 module.fail_json(msg='Could not delete role: {0}'.format(e.message))
 
-    return False, role
+    filters = None
+    if role and module.params['filters'] is not None:
+        filters_changed, filters = sync_filters(module, theforeman, role)
+        changed = changed or filters_changed
+
+    return changed, role, filters
 
 
 def main():
@@ -121,6 +231,9 @@ def main():
         argument_spec=dict(
             name=dict(type='str', required=True),
             state=dict(type='str', default='present', choices=['present', 'absent']),
+            filters=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
+            cache_dir=dict(type='path', required=False),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
@@ -131,9 +244,11 @@ def main():
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
 
-    changed, role = ensure(module)
-    module.exit_json(changed=changed, role=role)
+    changed, role, filters = ensure(module)
+    module.exit_json(changed=changed, role=role, filters=filters)
 
 
 from ansible.module_utils.basic import *
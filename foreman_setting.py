@@ -25,10 +25,19 @@ description:
 options:
   name:
     description: Setting name
-    required: true
+    required: false
   value:
     description: setting value
     required: false
+  settings:
+    description:
+    - List of settings, each defined by name and value. Mutually exclusive with name.
+    - All settings are fetched at once, only differing settings are updated in parallel.
+    required: false
+  workers:
+    description: Number of parallel requests used by settings
+    required: false
+    default: 4
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -62,6 +71,18 @@ EXAMPLES = '''
     foreman_port: 443
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure Settings
+  foreman_setting:
+    settings:
+    - name: outofsync_interval
+      value: 10
+    - name: entries_per_page
+      value: 50
+    foreman_host: foreman.example.com
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -70,6 +91,14 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
 
 def update_setting(setting, data):
     try:
@@ -81,6 +110,75 @@ def update_setting(setting, data):
 
 def fake_setting(setting, data):
     setting['value'] = data['value']
+    return setting
+
+
+def get_setting_value(setting, value):
+    # bool('false') is True, so booleans are parsed from their string representation
+    if isinstance(setting['value'], bool):
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ['true', 'yes', 'on', '1']:
+            return True
+        if str(value).lower() in ['false', 'no', 'off', '0']:
+            return False
+        module.fail_json(msg='Setting {0} requires a boolean value: {1}'.format(setting['name'], value))
+    if isinstance(setting['value'], int):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            module.fail_json(msg='Setting {0} requires an integer value: {1}'.format(setting['name'], value))
+    if isinstance(setting['value'], str):
+        return str(value)
+    return value
+
+
+def sync_settings(module):
+    global theforeman
+
+    workers = module.params['workers']
+    theforeman = init_foreman_client(module)
+
+    try:
+        settings = index_resources(get_all_resources(theforeman, 'settings'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get settings: {0}'.format(e.message))
+
+    for item in module.params['settings']:
+        if not item.get('name'):
+            module.fail_json(msg='Every setting requires a name: {0}'.format(item))
+        if 'value' not in item:
+            module.fail_json(msg='Setting {0} requires a value'.format(item.get('name')))
+
+    missing = [item.get('name') for item in module.params['settings'] if item.get('name') not in settings]
+    if missing:
+        module.fail_json(msg='Settings do not exist: {0}'.format(', '.join(str(name) for name in missing)))
+
+    changes = []
+    for item in module.params['settings']:
+        setting = settings[item.get('name')]
+        data = {'name': item.get('name'), 'value': get_setting_value(setting, item.get('value'))}
+        if data['value'] != setting['value']:
+            changes.append((setting, data))
+
+    def apply(change):
+        setting, data = change
+        if module.check_mode:
+            return fake_setting(setting, data)
+        return theforeman.update_setting(id=setting['id'], data=data)
+
+    result = []
+    errors = []
+    for change, setting, error in run_parallel(apply, changes, workers):
+        if error:
+            errors.append('{0}: {1}'.format(change[1]['name'], error))
+        else:
+            result.append(setting)
+
+    if errors:
+        module.fail_json(msg='Could not update settings: {0}'.format('; '.join(errors)),
+                         changed=len(result) > 0, settings=result)
+    return len(result) > 0, result
 
 
 def ensure(module):
@@ -110,10 +208,7 @@ def ensure(module):
     if not setting:
         module.fail_json(msg='Setting %s does not exist' % name)
 
-    if isinstance(setting['value'], (bool, str, int)):
-        data['value'] = type(setting['value'])(value)
-    else:
-        data['value'] = value
+    data['value'] = get_setting_value(setting, value)
 
     if data['value'] != setting['value']:
         if module.check_mode:
@@ -129,19 +224,30 @@ def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
-            value=dict(type='str', required=True),
+            name=dict(type='str', required=False),
+            value=dict(type='str', required=False),
+            settings=dict(type='list', required=False),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'settings']],
+        required_together=[['name', 'value']],
+        mutually_exclusive=[['name', 'settings']],
         supports_check_mode=True,
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['settings']:
+        changed, settings = sync_settings(module)
+        module.exit_json(changed=changed, settings=settings)
 
     changed, setting = ensure(module)
     module.exit_json(changed=changed, setting=setting)
@@ -22,10 +22,11 @@ module: foreman_smart_proxy
 short_description: Manage Foreman smart proxy resources using Foreman API v2
 description:
 - Create and delete Foreman smart proxy resources using Foreman API v2
+- Refresh the features of smart proxies
 options:
   name:
-    description: Smart proxy name
-    required: true
+    description: Smart proxy name. Mutually exclusive with smart_proxies.
+    required: false
   state:
     description: Smart proxy state
     required: false
@@ -41,6 +42,26 @@ options:
   organizations: List of organizations the smart_proxy should be assigned to
     required: false
     default: None
+  smart_proxies:
+    description:
+    - List of smart proxies, each defined by name and the options of a single smart proxy. Mutually exclusive with name.
+    - All smart proxies are listed once and changes are applied in parallel.
+    required: false
+    default: None
+  refresh:
+    description: Refresh the features of the smart proxies which are present
+    required: false
+    default: false
+  refresh_timeout:
+    description:
+    - Seconds to wait for the refresh of a single smart proxy.
+    - The module only stops waiting, the refresh request itself is not cancelled and may still complete in Foreman.
+    required: false
+    default: 60
+  workers:
+    description: Number of parallel requests used by smart_proxies and refresh
+    required: false
+    default: 4
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -65,6 +86,38 @@ version_added: "2.0"
 author: "Thomas Krahn (@nosmoht)"
 '''
 
+EXAMPLES = '''
+- name: Ensure Smart Proxy
+  foreman_smart_proxy:
+    name: SmartProxy01
+    url: https://proxy01.example.com:8443
+    state: present
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+
+- name: Ensure Smart Proxies and refresh their features
+  foreman_smart_proxy:
+    smart_proxies:
+    - name: SmartProxy01
+      url: https://proxy01.example.com:8443
+    - name: SmartProxy02
+      url: https://proxy02.example.com:8443
+      locations:
+      - London
+    refresh: true
+    refresh_timeout: 30
+    workers: 8
+    foreman_host: 127.0.0.1
+    foreman_port: 443
+    foreman_user: admin
+    foreman_pass: secret
+'''
+
+import threading
+import time
+
 try:
     from foreman.foreman import *
 
@@ -92,15 +145,123 @@ def smart_proxies_equal(data, smart_proxy):
     return True
 
 
-def ensure(module):
+def get_feature_names(smart_proxy):
+    return sorted(feature.get('name') for feature in smart_proxy.get('features') or [])
+
+
+def refresh_smart_proxy(theforeman, smart_proxy, timeout):
+    """Refresh the features of smart_proxy waiting at most timeout seconds.
+
+    Returns a dict with the refreshed features and the latency, or the error. python-foreman has no request
+    timeout, so a refresh which timed out is only no longer waited for and left running in a daemon thread.
+    """
+    response = dict()
+
+    def refresh():
+        try:
+            response['smart_proxy'] = theforeman.update_resource(resource_type='smart_proxies',
+                                                                 resource_id=smart_proxy.get('id'),
+                                                                 data={},
+                                                                 component='refresh')
+        except ForemanError as e:
+            response['error'] = e.message
+
+    start = time.time()
+    thread = threading.Thread(target=refresh)
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    latency = round(time.time() - start, 3)
+
+    if thread.is_alive():
+        return dict(error='Refresh timed out after {0} seconds'.format(timeout), refresh_latency=latency)
+    if 'error' in response:
+        return dict(error=response['error'], refresh_latency=latency)
+    return dict(features=get_feature_names(response.get('smart_proxy') or smart_proxy), refresh_latency=latency)
+
+
+def sync_smart_proxies(module):
+    workers = module.params['workers']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        smart_proxies = index_resources(get_all_resources(theforeman, 'smart_proxies'))
+    except ForemanError as e:
+        module.fail_json(msg='Could not get smart proxies: {0}'.format(e.message))
+
+    defined = []
+    for item in module.params['smart_proxies']:
+        data = {'name': item.get('name'), 'url': item.get('url')}
+        if item.get('organizations'):
+            data['organization_ids'] = get_indexed_ids(module, theforeman, indexes, 'organizations',
+                                                       item.get('organizations'))
+        if item.get('locations'):
+            data['location_ids'] = get_indexed_ids(module, theforeman, indexes, 'locations', item.get('locations'))
+        defined.append(dict(name=item.get('name'), state=item.get('state', 'present'), data=data))
+
+    # Organizations and locations are not part of the smart proxy listing
+    existing = [smart_proxies[item['name']] for item in defined
+                if item['state'] == 'present' and item['name'] in smart_proxies and
+                ('organization_ids' in item['data'] or 'location_ids' in item['data'])]
+    for found, smart_proxy, error in run_parallel(lambda found: theforeman.get_smart_proxy(id=found.get('id')),
+                                                  existing, workers):
+        if error:
+            module.fail_json(msg='Could not get smart proxy {0}: {1}'.format(found.get('name'), error))
+        smart_proxies[found.get('name')] = smart_proxy
+
+    changes = []
+    results = dict()
+    for item in defined:
+        smart_proxy = smart_proxies.get(item['name'])
+        action = get_sync_action(item['state'], smart_proxy,
+                                 lambda smart_proxy: smart_proxies_equal(item['data'], smart_proxy))
+        results[item['name']] = dict(name=item['name'], url=item['data']['url'], action=action)
+        if smart_proxy and action != 'deleted':
+            results[item['name']]['features'] = get_feature_names(smart_proxy)
+        changes.append(dict(name=item['name'], action=action, data=item['data'], smart_proxy=smart_proxy,
+                            result=results[item['name']]))
+
+    changed, _, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_smart_proxy(data=change['data']),
+        update=lambda change: theforeman.update_smart_proxy(id=change['smart_proxy'].get('id'), data=change['data']),
+        delete=lambda change: theforeman.delete_smart_proxy(id=change['smart_proxy'].get('id')),
+        workers=workers)
+    for change in changes:
+        if 'resource' in change and change['action'] != 'deleted':
+            smart_proxies[change['name']] = change['resource']
+            results[change['name']]['features'] = get_feature_names(change['resource'])
+
+    if module.params['refresh']:
+        refreshes = [smart_proxies[item['name']] for item in defined
+                     if item['state'] == 'present' and results[item['name']]['action'] != 'failed']
+        for smart_proxy, refreshed, error in run_parallel(
+                lambda smart_proxy: refresh_smart_proxy(theforeman, smart_proxy, module.params['refresh_timeout']),
+                refreshes, workers):
+            result = results[smart_proxy.get('name')]
+            if 'error' in refreshed:
+                result.update(refresh_latency=refreshed['refresh_latency'], refresh_error=refreshed['error'])
+                errors.append('{0}: {1}'.format(smart_proxy.get('name'), refreshed['error']))
+                continue
+            changed = changed or refreshed['features'] != result.get('features')
+            result.update(features=refreshed['features'], refresh_latency=refreshed['refresh_latency'])
+
+    results = [results[item['name']] for item in defined]
+    if errors:
+        module.fail_json(msg='Could not sync smart proxies: {0}'.format('; '.join(errors)),
+                         changed=changed, smart_proxies=results)
+    return changed, results
+
+
+def ensure(module, theforeman):
     name = module.params['name']
     url = module.params['url']
     state = module.params['state']
     organizations = module.params['organizations']
     locations = module.params['locations']
 
-    theforeman = init_foreman_client(module)
-
     data = {'name': name}
 
     try:
@@ -145,23 +306,43 @@ def ensure(module):
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            name=dict(type='str', required=True),
+            name=dict(type='str', required=False),
             url=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             organizations=dict(type='list', required=False),
             locations=dict(type='list', required=False),
+            smart_proxies=dict(type='list', required=False),
+            refresh=dict(type='bool', default=False),
+            refresh_timeout=dict(type='int', default=60),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['name', 'smart_proxies']],
+        mutually_exclusive=[['name', 'smart_proxies']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
 
-    changed, smart_proxy = ensure(module)
+    if module.params['smart_proxies']:
+        changed, smart_proxies = sync_smart_proxies(module)
+        module.exit_json(changed=changed, smart_proxies=smart_proxies)
+
+    theforeman = init_foreman_client(module)
+    changed, smart_proxy = ensure(module, theforeman)
+    if module.params['refresh'] and module.params['state'] == 'present':
+        refreshed = refresh_smart_proxy(theforeman, smart_proxy, module.params['refresh_timeout'])
+        if 'error' in refreshed:
+            module.fail_json(msg='Could not refresh smart proxy: {0}'.format(refreshed['error']),
+                             changed=changed, smart_proxy=smart_proxy)
+        changed = changed or refreshed['features'] != get_feature_names(smart_proxy)
+        smart_proxy['refresh_latency'] = refreshed['refresh_latency']
     module.exit_json(changed=changed, smart_proxy=smart_proxy)
 
 
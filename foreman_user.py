@@ -33,8 +33,8 @@ options:
     required: false
     default: 'Internal'
   login:
-    description: Name of user
-    required: true
+    description: Name of user. Mutually exclusive with users.
+    required: false
     default: None
     aliases: ['name']
   firstname:
@@ -62,6 +62,16 @@ options:
     required: false
     default: present
     choices: ["present", "absent"]
+  users:
+    description:
+    - List of users, each defined by login and the options of a single user. Mutually exclusive with login.
+    - All users and roles are listed once, changes are applied in parallel.
+    required: false
+    default: None
+  workers:
+    description: Number of parallel requests used by users
+    required: false
+    default: 4
   foreman_host:
     description: Hostname or IP address of Foreman system
     required: false
@@ -95,6 +105,23 @@ EXAMPLES = '''
       - "Viewer"
     foreman_user: admin
     foreman_pass: secret
+
+- name: Ensure users
+  foreman_user:
+    users:
+    - login: foo
+      mail: foo@example.com
+      roles:
+      - Viewer
+    - login: bar
+      auth: LDAP
+      roles:
+      - Viewer
+      - Manager
+    - login: baz
+      state: absent
+    foreman_user: admin
+    foreman_pass: secret
 '''
 
 try:
@@ -104,6 +131,16 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+USER_OPTIONS = ['admin', 'auth_source_name', 'firstname', 'lastname', 'mail']
+
 
 def get_roles(module, theforeman, roles):
     result = list()
@@ -136,6 +173,68 @@ def equal_roles(assigned_roles, defined_roles):
     return ar.issubset(dr) and dr.issubset(ar)
 
 
+def get_bulk_user_data(module, theforeman, indexes, item):
+    data = dict(login=item['login'], admin=item['admin'], auth_source_name=item['auth_source_name'])
+    for key in ['firstname', 'lastname', 'mail']:
+        if item.get(key) is not None:
+            data[key] = item[key]
+    role_names = [role.get('name') if isinstance(role, dict) else role for role in item.get('roles') or []]
+    data['roles'] = get_indexed_resources(module, theforeman, indexes, 'roles', role_names)
+    return data
+
+
+def users_equal(data, user):
+    return all(user.get(key, data[key]) == data[key] for key in USER_OPTIONS if key in data) and (
+        equal_roles(defined_roles=data.get('roles'), assigned_roles=user.get('roles')))
+
+
+def sync_users(module):
+    workers = module.params['workers']
+    indexes = dict()
+
+    theforeman = init_foreman_client(module)
+
+    try:
+        users = index_resources(get_all_resources(theforeman, 'users'), key='login')
+    except ForemanError as e:
+        module.fail_json(msg='Could not get users: {0}'.format(e.message))
+
+    defined = []
+    for item in module.params['users']:
+        state = item['state']
+        data = get_bulk_user_data(module, theforeman, indexes, item) if state == 'present' else None
+        defined.append(dict(login=item['login'], state=state, data=data,
+                            password=item.get('password')))
+
+    # Roles are not part of the user listing, the details of the users to compare are fetched in parallel
+    existing = [users[user['login']] for user in defined if user['state'] == 'present' and user['login'] in users]
+    details = dict()
+    for found, user, error in run_parallel(lambda found: theforeman.get_user(id=found.get('id')), existing, workers):
+        if error:
+            module.fail_json(msg='Could not get user {0}: {1}'.format(found.get('login'), error))
+        details[found.get('login')] = user
+
+    changes = []
+    for user in defined:
+        login = user['login']
+        data = user['data']
+        action = get_sync_action(user['state'], users.get(login), lambda found: users_equal(data, details[login]))
+        if action == 'created':
+            data['password'] = user['password']
+        changes.append(dict(name=login, action=action, data=data, user=details.get(login, users.get(login)),
+                            result=dict(login=login, action=action)))
+
+    changed, results, errors = apply_changes(
+        changes,
+        create=lambda change: theforeman.create_user(data=change['data']),
+        update=lambda change: theforeman.update_user(id=change['user'].get('id'), data=change['data']),
+        delete=lambda change: theforeman.delete_user(id=change['user'].get('id')),
+        workers=workers)
+    if errors:
+        module.fail_json(msg='Could not sync users: {0}'.format('; '.join(errors)), changed=changed, users=results)
+    return changed, results
+
+
 def ensure(module):
     login = module.params['login']
     state = module.params['state']
@@ -147,7 +246,7 @@ def ensure(module):
     foreman_pass = module.params['foreman_pass']
     foreman_ssl = module.params['foreman_ssl']
 
-    user_options = ['admin', 'auth_source_name', 'firstname', 'lastname', 'mail']
+    user_options = USER_OPTIONS
 
     theforeman = Foreman(hostname=foreman_host,
                          port=foreman_port,
@@ -210,23 +309,43 @@ def main():
         argument_spec=dict(
             admin=dict(type='str', required=False, default=False),
             auth_source_name=dict(type='str', default='Internal', aliases=['auth']),
-            login=dict(type='str', required=True, aliases=['name']),
+            login=dict(type='str', required=False, aliases=['name']),
             firstname=dict(type='str', required=False),
             lastname=dict(type='str', required=False),
             mail=dict(type='str', required=False),
             state=dict(type='str', default='present', choices=['present', 'absent']),
             password=dict(type='str', required=False, no_log=True),
             roles=dict(type='list', required=False),
+            users=dict(type='list', elements='dict', required=False, options=dict(
+                login=dict(type='str', required=True, aliases=['name']),
+                admin=dict(type='bool', default=False),
+                auth_source_name=dict(type='str', default='Internal', aliases=['auth']),
+                firstname=dict(type='str'),
+                lastname=dict(type='str'),
+                mail=dict(type='str'),
+                password=dict(type='str', no_log=True),
+                roles=dict(type='list'),
+                state=dict(type='str', default='present', choices=['present', 'absent']),
+            )),
+            workers=dict(type='int', default=4),
             foreman_host=dict(type='str', default='127.0.0.1'),
             foreman_port=dict(type='str', default='443'),
             foreman_user=dict(type='str', required=True),
             foreman_pass=dict(type='str', required=True, no_log=True),
             foreman_ssl=dict(type='bool', default=True)
         ),
+        required_one_of=[['login', 'users']],
+        mutually_exclusive=[['login', 'users']],
     )
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
+
+    if module.params['users']:
+        changed, users = sync_users(module)
+        module.exit_json(changed=changed, users=users)
 
     changed, user = ensure(module)
     module.exit_json(changed=changed, user=user)
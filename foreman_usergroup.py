@@ -23,21 +23,22 @@ DOCUMENTATION = '''
 module: foreman_usergroup
 short_description: Manage Foreman Usergroup using Foreman API v2
 description:
-- Create and delete Foreman Usergroups using Foreman API v2
+- Create, update and delete Foreman Usergroups using Foreman API v2
 options:
   name:
     description: name of the usergroup
     required: true
   users:
     description: user of this usergroup. Users are identified by their
-    login.
+    login. Members not listed are removed from an existing usergroup.
     required: false
   usergroups:
     description: usergroups of this usergroup. Usergroups can be
-    nested.
+    nested. Usergroups not listed are removed from an existing usergroup.
     required: false
   roles:
-    description: roles assigned to this usergroup
+    description: roles assigned to this usergroup. Roles not listed are
+    removed from an existing usergroup.
     required: false
   state:
     description: State of usergroup
@@ -64,7 +65,6 @@ options:
     default: true
 notes:
 - Requires the python-foreman package to be installed. See https://github.com/Nosmoht/python-foreman.
-- This module does currently not update already existing groups
 version_added: "2.0"
 author: "Thomas Krahn (@nosmoht)"
 '''
@@ -93,6 +93,23 @@ try:
 except ImportError:
     foremanclient_found = False
 
+try:
+    from ansible.module_utils.foreman_utils import *
+
+    has_import_error = False
+except ImportError as e:
+    has_import_error = True
+    import_error_msg = str(e)
+
+
+def get_membership_diff(usergroup, key, names, ids, field='name'):
+    """Return the names added to and removed from the members of usergroup stored in key."""
+    assigned = dict((item.get('id'), item.get(field)) for item in usergroup.get(key) or [])
+    defined = dict(zip(ids, names))
+    added = sorted(defined[i] for i in set(defined.keys()) - set(assigned.keys()))
+    removed = sorted(assigned[i] for i in set(assigned.keys()) - set(defined.keys()))
+    return added, removed
+
 
 def get_ids(module, theforeman, res_type, names, field='name'):
     result = []
@@ -140,17 +157,18 @@ def ensure(module):
     except ForemanError as e:
         module.fail_json(msg='Could not get usergroup: {0}'.format(e.message))
 
-    if not usergroup and state == 'present':
-        if usergroups:
+    if state == 'present':
+        if usergroups is not None:
             data['usergroup_ids'] = get_ids(module, theforeman, 'usergroup', usergroups)
-        if roles:
+        if roles is not None:
             data['role_ids'] = get_ids(module, theforeman, 'role', roles)
-        if users:
-            data['user_ids'] = get_ids(module, theforeman, 'user', users, field='login')
+        if users is not None:
+            data['user_ids'] = get_user_ids(module, theforeman, users)
 
+    if not usergroup and state == 'present':
         try:
             usergroup = theforeman.create_usergroup(data=data)
-            return True, usergroup
+            return True, usergroup, None
         except ForemanError as e:
             module.fail_json(msg='Could not create usergroup: {0}'.format(e.message))
 
@@ -159,9 +177,31 @@ def ensure(module):
             usergroup = theforeman.delete_usergroup(id=usergroup['id'])
         except ForemanError as e:
             module.fail_json(msg='Could not delete usergroup: {0}'.format(e.message))
-        return True, usergroup
+        return True, usergroup, None
+
+    if usergroup:
+        try:
+            usergroup = theforeman.get_usergroup(id=usergroup['id'])
+        except ForemanError as e:
+            module.fail_json(msg='Could not get usergroup: {0}'.format(e.message))
+
+        membership = dict()
+        for key, names, field in [('users', users, 'login'), ('roles', roles, 'name'),
+                                  ('usergroups', usergroups, 'name')]:
+            if names is None:
+                continue
+            added, removed = get_membership_diff(usergroup, key, names, data['{0}_ids'.format(key[:-1])], field)
+            if added or removed:
+                membership[key] = dict(added=added, removed=removed)
+
+        if membership:
+            try:
+                usergroup = theforeman.update_usergroup(id=usergroup['id'], data=data)
+                return True, usergroup, membership
+            except ForemanError as e:
+                module.fail_json(msg='Could not update usergroup: {0}'.format(e.message))
 
-    return False, usergroup
+    return False, usergroup, None
 
 
 def main():
@@ -182,9 +222,11 @@ def main():
 
     if not foremanclient_found:
         module.fail_json(msg='python-foreman module is required. See https://github.com/Nosmoht/python-foreman.')
+    if has_import_error:
+        module.fail_json(msg=import_error_msg)
 
-    changed, usergroup = ensure(module)
-    module.exit_json(changed=changed, usergroup=usergroup)
+    changed, usergroup, membership = ensure(module)
+    module.exit_json(changed=changed, usergroup=usergroup, membership=membership)
 
 
 from ansible.module_utils.basic import *
@@ -1,6 +1,20 @@
 # -*- coding: utf-8 -*-
 # (c) Radim Janča (Cesnet) 2018
 
+import hashlib
+import json
+import os
+import re
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    import yaml
+
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
 try:
     from foreman.foreman import *
 except ImportError:
@@ -15,6 +29,566 @@ def init_foreman_client(module):
                    ssl=module.params['foreman_ssl'])
 
 
+FOREMAN_PER_PAGE = 1000
+FOREMAN_SEARCH_CHUNK = 50
+# Above this number of logins all users are listed once instead of searching them in chunks
+FOREMAN_USER_LISTING_THRESHOLD = 500
+FOREMAN_RETRIES = 3
+FOREMAN_RETRY_DELAY = 2
+# Lifetime of cached catalogs keyed by Foreman version if the version can not be determined
+FOREMAN_VERSION_CACHE_TTL = 86400
+# Keys of compute attributes whose values can be resolved by name in the available_* catalogs of a compute resource
+COMPUTE_RESOURCE_CATALOGS = dict(cluster='clusters',
+                                 network='networks',
+                                 datastore='storage_domains',
+                                 storage_domain='storage_domains',
+                                 storage_pod='storage_pods')
+# Resource pools are not listed here, Foreman only has them per cluster in available_clusters/:id/resource_pools
+# Resources which can be associated with locations and organizations and the key of their ids
+TAXONOMY_RESOURCES = dict(compute_resources='compute_resource_ids',
+                          config_templates='config_template_ids',
+                          domains='domain_ids',
+                          environments='environment_ids',
+                          hostgroups='hostgroup_ids',
+                          media='medium_ids',
+                          ptables='ptable_ids',
+                          realms='realm_ids',
+                          smart_proxies='smart_proxy_ids',
+                          subnets='subnet_ids',
+                          users='user_ids')
+TEMPLATE_METADATA_RE = re.compile(r'\A\s*<%#(.*?)%>', re.DOTALL)
+
+# Image indexes of compute resources, valid for the run of a module
+image_indexes = dict()
+
+
+def get_all_resources(theforeman, resource_type, search=None, per_page=FOREMAN_PER_PAGE):
+    """Return every element of a collection, following the pagination of the API."""
+    result = []
+    page = 1
+    while True:
+        data = {'page': page, 'per_page': per_page}
+        if search:
+            data['search'] = search
+        items = theforeman.get_resources(resource_type=resource_type, data=data)
+        if isinstance(items, dict):
+            items = items.get('results')
+        if not items:
+            break
+        result.extend(items)
+        if len(items) < per_page:
+            break
+        page += 1
+    return result
+
+
+def search_values(field, values):
+    return '{field} ^ ({values})'.format(field=field,
+                                         values=','.join('"{0}"'.format(v) for v in values))
+
+
+def search_resources_by_values(theforeman, resource_type, field, values, chunk_size=FOREMAN_SEARCH_CHUNK):
+    """Fetch all resources whose field matches one of values using chunked scoped searches."""
+    result = []
+    values = list(values)
+    for i in range(0, len(values), chunk_size):
+        result.extend(get_all_resources(theforeman, resource_type,
+                                        search=search_values(field, values[i:i + chunk_size])))
+    return result
+
+
+def index_resources(resources, key='name'):
+    return dict((item.get(key), item) for item in resources)
+
+
+def get_user_ids(module, theforeman, logins):
+    """Resolve logins to user ids using chunked scoped searches, or one listing of all users for many logins."""
+    logins = list(logins)
+    try:
+        if len(logins) > FOREMAN_USER_LISTING_THRESHOLD:
+            users = get_all_resources(theforeman, 'users')
+        else:
+            users = search_resources_by_values(theforeman, 'users', 'login', logins)
+    except ForemanError as e:
+        module.fail_json(msg='Could not get users: {0}'.format(e.message))
+    index = index_resources(users, key='login')
+    missing = [login for login in logins if login not in index]
+    if missing:
+        module.fail_json(msg='Could not find users: {0}'.format(', '.join(str(name) for name in missing)))
+    return [index[login].get('id') for login in logins]
+
+
+def build_resource_index(resources, keys):
+    """Index resources by the values of keys, earlier keys take precedence.
+
+    Returns the index and a dict of the values which match several resources under the first key matching them.
+    Those values are not part of the index.
+    """
+    index = dict()
+    ambiguous = dict()
+    for key in keys:
+        matches = dict()
+        for item in resources:
+            if item.get(key) is not None:
+                matches.setdefault(item.get(key), []).append(item)
+        for value, items in matches.items():
+            if value in index or value in ambiguous:
+                continue
+            if len(items) == 1:
+                index[value] = items[0]
+            else:
+                ambiguous[value] = items
+    return index, ambiguous
+
+
+def get_resource_index(module, theforeman, indexes, resource_type, keys=('title', 'name')):
+    """Return an index of all resources of resource_type by the given keys, listing the collection only once.
+
+    indexes is a dict owned by the caller which memoizes the index of every resource type. Values matching
+    several resources are left out of the index, see get_indexed_resources.
+    """
+    if resource_type not in indexes:
+        try:
+            resources = get_all_resources(theforeman, resource_type)
+        except ForemanError as e:
+            module.fail_json(msg='Could not list {0}: {1}'.format(resource_type, e.message))
+        indexes[resource_type], indexes[(resource_type, 'ambiguous')] = build_resource_index(resources, keys)
+    return indexes[resource_type]
+
+
+def get_indexed_resources(module, theforeman, indexes, resource_type, names, all_matches=False):
+    """Resolve names to resources of resource_type, failing for every name which is missing.
+
+    A name matching several resources, e.g. an operatingsystem name shared by all its versions or the name of
+    nested hostgroups, fails unless all_matches is set, which resolves it to all matching resources.
+    """
+    index = get_resource_index(module, theforeman, indexes, resource_type)
+    ambiguous = indexes[(resource_type, 'ambiguous')]
+    missing = [name for name in names if name not in index and name not in ambiguous]
+    if missing:
+        module.fail_json(msg='Could not find {0}: {1}'.format(resource_type, ', '.join(str(name) for name in missing)))
+    if not all_matches:
+        duplicates = [name for name in names if name in ambiguous]
+        if duplicates:
+            module.fail_json(msg='Several {0} match {1}, use their title instead'.format(
+                resource_type, ', '.join(str(name) for name in duplicates)))
+    result = []
+    for name in names:
+        result.extend(ambiguous[name] if name in ambiguous else [index[name]])
+    return result
+
+
+def get_indexed_ids(module, theforeman, indexes, resource_type, names, all_matches=False):
+    return [item.get('id') for item in get_indexed_resources(module, theforeman, indexes, resource_type, names,
+                                                             all_matches)]
+
+
+def get_taxonomy_resource_ids(module, theforeman, resources):
+    """Resolve a dict of resource type to names into a dict of the *_ids keys of a location or organization."""
+    unknown = sorted(set(resources.keys()) - set(TAXONOMY_RESOURCES.keys()))
+    if unknown:
+        module.fail_json(msg='Unknown resource types {0}, supported are {1}'.format(
+            ', '.join(unknown), ', '.join(sorted(TAXONOMY_RESOURCES.keys()))))
+    indexes = dict()
+    result = dict()
+    for resource_type, names in resources.items():
+        if resource_type == 'users':
+            ids = get_user_ids(module, theforeman, names or [])
+        else:
+            ids = get_indexed_ids(module, theforeman, indexes, resource_type, names or [])
+        result[TAXONOMY_RESOURCES[resource_type]] = ids
+    return result
+
+
+def split_taxonomy_title(title):
+    """Split the title of a nested location or organization into the title of its parent and its name."""
+    if '/' not in title:
+        return None, title
+    return tuple(title.rsplit('/', 1))
+
+
+def sync_taxonomy_tree(module, theforeman, resource_type, create, titles, workers=4):
+    """Ensure all locations or organizations of titles and their parents exist.
+
+    All taxonomies are listed once and indexed by title, missing ones are created level by level in parallel using
+    create, with the parent ids taken from the responses of the level above.
+    """
+    try:
+        index = index_resources(get_all_resources(theforeman, resource_type), key='title')
+    except ForemanError as e:
+        module.fail_json(msg='Could not list {0}: {1}'.format(resource_type, e.message))
+
+    levels = dict()
+    for title in titles:
+        parts = title.split('/')
+        for depth in range(1, len(parts) + 1):
+            levels.setdefault(depth, set()).add('/'.join(parts[:depth]))
+
+    def create_node(title):
+        parent_title, name = split_taxonomy_title(title)
+        data = dict(name=name)
+        if parent_title:
+            data['parent_id'] = index[parent_title].get('id')
+        return create(data=data)
+
+    results = []
+    errors = []
+    for depth in sorted(levels.keys()):
+        missing = []
+        for title in sorted(levels[depth]):
+            parent_title, name = split_taxonomy_title(title)
+            if title in index:
+                results.append(dict(title=title, action='unchanged'))
+            elif parent_title and parent_title not in index:
+                results.append(dict(title=title, action='failed', error='Parent {0} is missing'.format(parent_title)))
+            else:
+                missing.append(title)
+        for title, created, error in run_parallel(create_node, missing, workers):
+            if error:
+                results.append(dict(title=title, action='failed', error=error))
+                errors.append('{0}: {1}'.format(title, error))
+            else:
+                index[title] = created
+                results.append(dict(title=title, action='created'))
+
+    changed = any(result['action'] == 'created' for result in results)
+    if errors:
+        module.fail_json(msg='Could not sync {0}: {1}'.format(resource_type, '; '.join(errors)),
+                         changed=changed, tree=results)
+    return changed, results
+
+
+def get_taxonomy_resource_changes(taxonomy, resource_ids, append=False):
+    """Compare resource_ids with the resources associated with taxonomy.
+
+    Returns the *_ids to update and the number of added and removed resources per resource type. If append is set
+    resources already associated are kept.
+    """
+    data = dict()
+    changes = dict()
+    for resource_type, key in TAXONOMY_RESOURCES.items():
+        if key not in resource_ids:
+            continue
+        assigned = set(item.get('id') for item in taxonomy.get(resource_type) or [])
+        defined = set(resource_ids[key])
+        if append:
+            defined |= assigned
+        if defined != assigned:
+            data[key] = sorted(defined)
+            changes[resource_type] = dict(added=len(defined - assigned), removed=len(assigned - defined))
+    return data, changes
+
+
+def run_parallel(func, items, workers=4):
+    """Call func for every item using a bounded pool of threads.
+
+    Returns a list of (item, result, error) tuples in the order of items. ForemanErrors are
+    caught and returned so the caller can report them, as fail_json must not be called from
+    a worker thread.
+    """
+    def call(item):
+        try:
+            return item, func(item), None
+        except ForemanError as e:
+            return item, None, e.message
+
+    items = list(items)
+    if not items:
+        return []
+    if workers <= 1 or len(items) == 1:
+        return [call(item) for item in items]
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def is_server_error(e):
+    try:
+        return 500 <= int(getattr(e, 'status_code', None)) < 600
+    except (TypeError, ValueError):
+        return False
+
+
+def delete_resources(theforeman, resource_type, resources, workers=4, retries=FOREMAN_RETRIES,
+                     retry_delay=FOREMAN_RETRY_DELAY):
+    """Delete resources using a bounded pool of threads, retrying deletes which failed with a 5xx status.
+
+    Returns a list of (resource, result, error) tuples like run_parallel.
+    """
+    def delete(resource):
+        attempt = 0
+        while True:
+            try:
+                return theforeman.delete_resource(resource_type=resource_type, resource_id=resource.get('id'))
+            except ForemanError as e:
+                attempt += 1
+                if attempt > retries or not is_server_error(e):
+                    raise
+                time.sleep(retry_delay * attempt)
+
+    return run_parallel(delete, resources, workers)
+
+
+def get_sync_action(state, resource, equal):
+    """Return the action which brings resource to the defined state.
+
+    equal is only called for an existing resource to be kept and tells whether its data is up to date.
+    """
+    if state == 'absent':
+        return 'deleted' if resource else 'unchanged'
+    if not resource:
+        return 'created'
+    return 'unchanged' if equal(resource) else 'updated'
+
+
+def apply_changes(changes, create, update, delete, workers=4):
+    """Apply the planned changes of a list of resources in parallel.
+
+    Every change is a dict with the name used in errors, an action as returned by get_sync_action and the result
+    dict to report. create, update or delete is called with the change depending on its action, unchanged ones
+    are skipped. The resource returned by the request is stored in the change, a failed request sets the action
+    of the result to failed and adds the error.
+
+    Returns whether any request succeeded, the results in the order of changes and the errors.
+    """
+    funcs = dict(created=create, updated=update, deleted=delete)
+    applied = [change for change in changes if change['action'] != 'unchanged']
+    errors = []
+    for change, resource, error in run_parallel(lambda change: funcs[change['action']](change), applied, workers):
+        if error:
+            change['result'].update(action='failed', error=error)
+            errors.append('{0}: {1}'.format(change['name'], error))
+        else:
+            change['resource'] = resource
+    return len(errors) < len(applied), [change['result'] for change in changes], errors
+
+
+def content_digest(content):
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def data_digest(data):
+    return content_digest(json.dumps(data, sort_keys=True))
+
+
+def get_cache_file(module, name):
+    filename = '{host}_{port}_{name}.json'.format(host=module.params['foreman_host'],
+                                                  port=module.params['foreman_port'],
+                                                  name=name)
+    return os.path.join(os.path.expanduser(module.params['cache_dir']), filename)
+
+
+def load_cache(module, name, ttl=None):
+    """Load a cache file stored in cache_dir, an expired or unreadable cache is returned empty."""
+    if not module.params.get('cache_dir'):
+        return dict()
+    cache_file = get_cache_file(module, name)
+    try:
+        if ttl is not None and time.time() - os.path.getmtime(cache_file) > ttl:
+            return dict()
+        with open(cache_file) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return dict()
+
+
+def save_cache(module, name, data):
+    if not module.params.get('cache_dir'):
+        return
+    cache_file = get_cache_file(module, name)
+    try:
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file))
+        tmp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError) as e:
+        module.warn('Could not write cache file {0}: {1}'.format(cache_file, e))
+
+
+def digest_unchanged(cache, section, resource, digest):
+    """Check if resource was not modified since digest was remembered for it, based on its updated_at."""
+    entry = cache.get(section, dict()).get(str(resource.get('id')))
+    if not entry or not resource.get('updated_at'):
+        return False
+    return entry.get('updated_at') == resource.get('updated_at') and entry.get('digest') == digest
+
+
+def remember_digest(cache, section, resource, digest):
+    if resource and resource.get('updated_at'):
+        cache.setdefault(section, dict())[str(resource.get('id'))] = dict(updated_at=resource.get('updated_at'),
+                                                                          digest=digest)
+
+
+def parse_template_metadata(content):
+    match = TEMPLATE_METADATA_RE.match(content)
+    if not match:
+        return dict()
+    try:
+        metadata = yaml.safe_load(match.group(1))
+    except yaml.YAMLError:
+        return dict()
+    if not isinstance(metadata, dict):
+        return dict()
+    return metadata
+
+
+def read_template_directory(module, directory, model):
+    """Read all template files below directory whose metadata header has no or the given model.
+
+    The template name is taken from the metadata, or from the file name if the metadata does not define it.
+    """
+    if not HAS_YAML:
+        module.fail_json(msg='PyYAML is required to read template metadata from a directory.')
+    result = []
+    names = dict()
+    for root, dirs, files in os.walk(os.path.expanduser(directory)):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                with open(path) as f:
+                    content = f.read()
+            except IOError as e:
+                module.fail_json(msg='Could not open file {0}: {1}'.format(path, e))
+            metadata = parse_template_metadata(content)
+            if metadata.get('model', model) != model:
+                continue
+            name = metadata.get('name') or os.path.splitext(filename)[0]
+            if name in names:
+                module.fail_json(msg='Template {0} is defined in {1} and {2}'.format(name, names[name], path))
+            names[name] = path
+            result.append(dict(name=name, path=path, content=content, metadata=metadata))
+    return result
+
+
+def get_foreman_version(theforeman):
+    """Return the version of Foreman or None if the status can not be read."""
+    try:
+        status = theforeman.get_resources(resource_type='status')
+    except ForemanError:
+        return None
+    if isinstance(status, dict):
+        return status.get('version')
+    return None
+
+
+def get_permission_index(module, theforeman):
+    """Return the ids of all permissions indexed by (resource_type, name).
+
+    Permissions only change with Foreman upgrades, so the catalog is cached in cache_dir for the Foreman version.
+    """
+    version = get_foreman_version(theforeman)
+    cache = load_cache(module, 'permissions')
+    if cache and version and cache.get('version') == version:
+        permissions = cache['permissions']
+    elif cache and not version and time.time() - cache.get('fetched', 0) <= FOREMAN_VERSION_CACHE_TTL:
+        permissions = cache['permissions']
+    else:
+        try:
+            permissions = [[item.get('resource_type'), item.get('name'), item.get('id')]
+                           for item in get_all_resources(theforeman, 'permissions')]
+        except ForemanError as e:
+            module.fail_json(msg='Could not get Permissions: {0}'.format(e.message))
+        save_cache(module, 'permissions', dict(version=version, fetched=time.time(), permissions=permissions))
+    return dict(((resource_type, name), permission_id) for resource_type, name, permission_id in permissions)
+
+
+def get_image_index(theforeman, compute_resource_id):
+    """Return the images of a compute resource as dict of image name to the list of images with that name."""
+    if compute_resource_id not in image_indexes:
+        by_name = dict()
+        for image in get_all_resources(theforeman, 'compute_resources/{0}/images'.format(compute_resource_id)):
+            by_name.setdefault(image.get('name'), []).append(image)
+        image_indexes[compute_resource_id] = by_name
+    return image_indexes[compute_resource_id]
+
+
+def invalidate_image_index(compute_resource_id):
+    image_indexes.pop(compute_resource_id, None)
+
+
+def get_catalog_names(attributes):
+    result = set()
+    if isinstance(attributes, dict):
+        for key, value in attributes.items():
+            if key in COMPUTE_RESOURCE_CATALOGS and not isinstance(value, (dict, list)):
+                result.add(COMPUTE_RESOURCE_CATALOGS[key])
+            else:
+                result.update(get_catalog_names(value))
+    elif isinstance(attributes, list):
+        for value in attributes:
+            result.update(get_catalog_names(value))
+    return result
+
+
+def get_compute_resource_catalogs(module, theforeman, compute_resource_id, catalog_names, memo, workers=4):
+    """Return the requested available_* catalogs of a compute resource as name to id mappings.
+
+    Catalogs are kept in memo for the run and in cache_dir for catalog_cache_ttl seconds, as every
+    request makes Foreman query the compute resource. Missing catalogs are fetched in parallel.
+    """
+    cache_name = 'compute_resource_{0}_catalogs'.format(compute_resource_id)
+    if compute_resource_id not in memo:
+        ttl = module.params['catalog_cache_ttl']
+        memo[compute_resource_id] = dict((name, catalog) for name, catalog in
+                                         load_cache(module, cache_name).items()
+                                         if time.time() - catalog.get('fetched', 0) <= ttl)
+    catalogs = memo[compute_resource_id]
+
+    missing = [name for name in catalog_names if name not in catalogs]
+    if missing:
+        def get_catalog(name):
+            return theforeman.get_resource(resource_type='compute_resources', resource_id=compute_resource_id,
+                                           component='available_{0}'.format(name))
+
+        for name, catalog, error in run_parallel(get_catalog, missing, workers):
+            if error:
+                module.fail_json(msg='Could not get available {0} of compute resource {1}: {2}'.format(
+                    name, compute_resource_id, error))
+            catalogs[name] = dict(fetched=time.time(),
+                                  items=dict((item.get('name'), item.get('id')) for item in
+                                             catalog.get('results') or []))
+        save_cache(module, cache_name, catalogs)
+
+    return dict((name, catalogs[name]['items']) for name in catalog_names)
+
+
+def resolve_catalog_names(attributes, catalogs):
+    if isinstance(attributes, dict):
+        result = dict()
+        for key, value in attributes.items():
+            items = catalogs.get(COMPUTE_RESOURCE_CATALOGS.get(key), dict())
+            if not isinstance(value, (dict, list)) and value in items:
+                result[key] = items[value]
+            else:
+                result[key] = resolve_catalog_names(value, catalogs)
+        return result
+    if isinstance(attributes, list):
+        return [resolve_catalog_names(value, catalogs) for value in attributes]
+    return attributes
+
+
+def resolve_compute_resource_names(module, theforeman, compute_resource_id, attributes, memo, workers=4):
+    """Replace names of clusters, networks, storage domains and storage pods in attributes by their ids.
+
+    Values which are no known name are kept, so ids can still be used.
+    """
+    catalog_names = get_catalog_names(attributes)
+    if not catalog_names:
+        return attributes
+    catalogs = get_compute_resource_catalogs(module, theforeman, compute_resource_id, catalog_names, memo, workers)
+    return resolve_catalog_names(attributes, catalogs)
+
+
 def equal_dict_lists(l1, l2, compare_key='name'):
     s1 = set(map(lambda x: x[compare_key], l1))
     s2 = set(map(lambda x: x[compare_key], l2))